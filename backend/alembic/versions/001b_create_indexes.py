@@ -0,0 +1,57 @@
+"""Create secondary indexes
+
+Revision ID: 001b_indexes
+Revises: 001_initial
+Create Date: 2026-10-14 00:00:00.000000
+
+Adds the composite and foreign-key indexes that 001_initial does not create,
+so environments which bulk-load seed data (tests, CI, dev snapshots) can run
+`alembic upgrade 001_initial`, load the data, and then `alembic upgrade head`.
+Building each index once over the loaded rows is much cheaper than
+maintaining it on every insert.
+
+Only the indexes below are deferred. 001_initial has shipped, so a seed that
+runs after it still maintains everything that revision creates: primary keys,
+every foreign key (checked per row), the unique ix_users_email and
+ix_users_username, the ix_<table>_id indexes, ix_projects_name and
+ix_document_chunks_document_id.
+
+Every index uses IF NOT EXISTS or IF EXISTS, so the revision applies
+cleanly to any existing database. Foreign keys are not touched; they are
+created inline, and validated, by 001_initial.
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '001b_indexes'
+down_revision = '001_initial'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_projects_user_id', 'projects', ['user_id'], unique=False, if_not_exists=True)
+
+    op.create_index('ix_documents_project_id', 'documents', ['project_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_documents_user_project', 'documents', ['user_id', 'project_id', 'created_at'], unique=False, if_not_exists=True)
+
+    # The composite index also serves plain document_id lookups, so it
+    # replaces 001_initial's single-column one
+    op.create_index('ix_document_chunks_document_chunk', 'document_chunks', ['document_id', 'chunk_index'], unique=False, if_not_exists=True)
+    op.drop_index('ix_document_chunks_document_id', table_name='document_chunks', if_exists=True)
+
+    op.create_index('ix_qa_sessions_user_project', 'qa_sessions', ['user_id', 'project_id', 'updated_at'], unique=False, if_not_exists=True)
+
+    op.create_index('ix_qa_responses_session_created', 'qa_responses', ['session_id', 'created_at'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_qa_responses_session_created', table_name='qa_responses', if_exists=True)
+    op.drop_index('ix_qa_sessions_user_project', table_name='qa_sessions', if_exists=True)
+    op.create_index('ix_document_chunks_document_id', 'document_chunks', ['document_id'], unique=False, if_not_exists=True)
+    op.drop_index('ix_document_chunks_document_chunk', table_name='document_chunks', if_exists=True)
+    op.drop_index('ix_documents_user_project', table_name='documents', if_exists=True)
+    op.drop_index('ix_documents_project_id', table_name='documents', if_exists=True)
+    op.drop_index('ix_projects_user_id', table_name='projects', if_exists=True)
@@ -0,0 +1,26 @@
+"""Add document content hash
+
+Revision ID: 003_file_hash
+Revises: 001b_indexes
+Create Date: 2026-10-14 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '003_file_hash'
+down_revision = '001b_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('documents', sa.Column('file_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_documents_user_file_hash', 'documents', ['user_id', 'file_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_user_file_hash', table_name='documents')
+    op.drop_column('documents', 'file_hash')
@@ -0,0 +1,38 @@
+"""Bump qa_sessions.updated_at from a trigger on qa_responses
+
+Revision ID: 004_session_touch
+Revises: 003_file_hash
+Create Date: 2026-10-14 00:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '004_session_touch'
+down_revision = '003_file_hash'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Saving an answer marks its session as recently active, inside the same
+    # statement, so the API does not need a separate UPDATE round-trip
+    op.execute("""
+        CREATE FUNCTION bump_session_updated_at() RETURNS trigger AS $$
+        BEGIN
+            UPDATE qa_sessions SET updated_at = now() WHERE id = NEW.session_id;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER qa_responses_bump_session_updated_at
+        AFTER INSERT ON qa_responses
+        FOR EACH ROW EXECUTE FUNCTION bump_session_updated_at()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS qa_responses_bump_session_updated_at ON qa_responses")
+    op.execute("DROP FUNCTION IF EXISTS bump_session_updated_at()")
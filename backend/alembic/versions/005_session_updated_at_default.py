@@ -0,0 +1,27 @@
+"""Default qa_sessions.updated_at to now()
+
+Revision ID: 005_session_updated_default
+Revises: 004_session_touch
+Create Date: 2026-10-14 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005_session_updated_default'
+down_revision = '004_session_touch'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # New sessions get a timestamp from the DB clock; backfill existing ones so
+    # "most recently updated" ordering does not put untouched sessions first
+    op.alter_column('qa_sessions', 'updated_at', server_default=sa.text('now()'))
+    op.execute("UPDATE qa_sessions SET updated_at = created_at WHERE updated_at IS NULL")
+
+
+def downgrade() -> None:
+    op.alter_column('qa_sessions', 'updated_at', server_default=None)
@@ -0,0 +1,37 @@
+"""Add indexes for document status, recency and embedding lookups
+
+Revision ID: 006_query_indexes
+Revises: 005_session_updated_default
+Create Date: 2026-10-14 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006_query_indexes'
+down_revision = '005_session_updated_default'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # (project_id, status) also serves plain project_id lookups
+    op.create_index('ix_documents_project_status', 'documents', ['project_id', 'status'], unique=False)
+    op.drop_index(op.f('ix_documents_project_id'), table_name='documents')
+    op.create_index('ix_documents_user_created', 'documents', ['user_id', 'created_at'], unique=False)
+    # Enum columns store member names, hence 'INDEXED'
+    op.create_index(
+        'ix_documents_indexed_only', 'documents', ['project_id'], unique=False,
+        postgresql_where=sa.text("status = 'INDEXED'"),
+    )
+    op.create_index('ix_document_chunks_embedding_id', 'document_chunks', ['embedding_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_chunks_embedding_id', table_name='document_chunks')
+    op.drop_index('ix_documents_indexed_only', table_name='documents')
+    op.drop_index('ix_documents_user_created', table_name='documents')
+    op.create_index(op.f('ix_documents_project_id'), 'documents', ['project_id'], unique=False)
+    op.drop_index('ix_documents_project_status', table_name='documents')
@@ -0,0 +1,44 @@
+"""Store QA response citations as JSONB
+
+Revision ID: 007_qa_jsonb
+Revises: 006_query_indexes
+Create Date: 2026-10-14 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '007_qa_jsonb'
+down_revision = '006_query_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        'qa_responses', 'citations',
+        type_=postgresql.JSONB(), postgresql_using='citations::jsonb',
+    )
+    op.alter_column(
+        'qa_responses', 'retrieved_chunk_ids',
+        type_=postgresql.JSONB(), postgresql_using='retrieved_chunk_ids::jsonb',
+    )
+    op.create_index(
+        'ix_qa_responses_citations_gin', 'qa_responses', ['citations'], unique=False,
+        postgresql_using='gin', postgresql_ops={'citations': 'jsonb_path_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_qa_responses_citations_gin', table_name='qa_responses')
+    op.alter_column(
+        'qa_responses', 'retrieved_chunk_ids',
+        type_=sa.JSON(), postgresql_using='retrieved_chunk_ids::json',
+    )
+    op.alter_column(
+        'qa_responses', 'citations',
+        type_=sa.JSON(), postgresql_using='citations::json',
+    )
@@ -0,0 +1,67 @@
+"""Store document status and type as SMALLINT codes
+
+Revision ID: 008_enum_codes
+Revises: 007_qa_jsonb
+Create Date: 2026-10-14 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008_enum_codes'
+down_revision = '007_qa_jsonb'
+branch_labels = None
+depends_on = None
+
+# (column, enum type, member names in code order); must match the models'
+# STATUS_CODES / TYPE_CODES
+COLUMNS = [
+    ('status', 'documentstatus', ['UPLOADED', 'PROCESSING', 'INDEXED', 'FAILED']),
+    ('document_type', 'documenttype', ['PDF', 'HTML', 'MARKDOWN', 'TEXT', 'DOCX']),
+]
+
+
+def upgrade() -> None:
+    # The partial index compares against the old enum label; rebuild it on the code
+    op.drop_index('ix_documents_indexed_only', table_name='documents')
+    op.alter_column('documents', 'status', server_default=None)
+    
+    for column, enum_name, members in COLUMNS:
+        cases = " ".join(f"WHEN '{name}' THEN {code}" for code, name in enumerate(members))
+        op.execute(
+            f"ALTER TABLE documents ALTER COLUMN {column} TYPE smallint "
+            f"USING (CASE {column}::text {cases} END)"
+        )
+        op.create_check_constraint(
+            f'ck_documents_{column}', 'documents', f'{column} BETWEEN 0 AND {len(members) - 1}',
+        )
+        op.execute(f"DROP TYPE {enum_name}")
+    
+    op.alter_column('documents', 'status', server_default=sa.text('0'))
+    op.create_index(
+        'ix_documents_indexed_only', 'documents', ['project_id'], unique=False,
+        postgresql_where=sa.text("status = 2"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_indexed_only', table_name='documents')
+    op.alter_column('documents', 'status', server_default=None)
+    
+    for column, enum_name, members in COLUMNS:
+        labels = ", ".join(f"'{name}'" for name in members)
+        cases = " ".join(f"WHEN {code} THEN '{name}'" for code, name in enumerate(members))
+        op.drop_constraint(f'ck_documents_{column}', 'documents', type_='check')
+        op.execute(f"CREATE TYPE {enum_name} AS ENUM ({labels})")
+        op.execute(
+            f"ALTER TABLE documents ALTER COLUMN {column} TYPE {enum_name} "
+            f"USING (CASE {column} {cases} END)::{enum_name}"
+        )
+    
+    op.alter_column('documents', 'status', server_default=sa.text("'UPLOADED'"))
+    op.create_index(
+        'ix_documents_indexed_only', 'documents', ['project_id'], unique=False,
+        postgresql_where=sa.text("status = 'INDEXED'"),
+    )
@@ -0,0 +1,24 @@
+"""Add document chunk token count
+
+Revision ID: 009_chunk_tokens
+Revises: 008_enum_codes
+Create Date: 2026-10-14 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009_chunk_tokens'
+down_revision = '008_enum_codes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('document_chunks', sa.Column('token_count', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('document_chunks', 'token_count')
@@ -0,0 +1,40 @@
+"""Store document chunk embedding ids as UUID
+
+Revision ID: 010_embedding_uuid
+Revises: 009_chunk_tokens
+Create Date: 2026-10-14 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '010_embedding_uuid'
+down_revision = '009_chunk_tokens'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_document_chunks_embedding_id', table_name='document_chunks')
+    # Old "chunk_<id>" values are not UUIDs, so indexed chunks get fresh ids.
+    # Vectors already stored under the old ids are not renamed; reindex the
+    # affected documents to link them again.
+    op.alter_column(
+        'document_chunks', 'embedding_id',
+        type_=postgresql.UUID(as_uuid=True),
+        postgresql_using='CASE WHEN embedding_id IS NULL THEN NULL ELSE gen_random_uuid() END',
+    )
+    op.create_index('ix_document_chunks_embedding_id', 'document_chunks', ['embedding_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_chunks_embedding_id', table_name='document_chunks')
+    op.alter_column(
+        'document_chunks', 'embedding_id',
+        type_=sa.String(),
+        postgresql_using='embedding_id::text',
+    )
+    op.create_index('ix_document_chunks_embedding_id', 'document_chunks', ['embedding_id'], unique=False)
@@ -0,0 +1,34 @@
+"""Reset indexed documents so they are reindexed
+
+Revision ID: 011_reindex
+Revises: 010_embedding_uuid
+Create Date: 2026-10-14 00:00:00.000000
+
+Vectors written before this release cannot be reached any more: the vector DB
+collection is now named per embedding model, and 010_embedding_uuid gave every
+chunk a fresh embedding id. Documents marked INDEXED are reset to UPLOADED so
+the reindex_documents task (see SETUP.md) picks them up again.
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '011_reindex'
+down_revision = '010_embedding_uuid'
+branch_labels = None
+depends_on = None
+
+# Status codes, as in the models' STATUS_CODES
+UPLOADED = 0
+INDEXED = 2
+
+
+def upgrade() -> None:
+    op.execute(f"UPDATE documents SET status = {UPLOADED}, indexed_at = NULL WHERE status = {INDEXED}")
+
+
+def downgrade() -> None:
+    # Which documents were reset is not recorded; reindexing marks them
+    # INDEXED again
+    pass
@@ -0,0 +1,35 @@
+"""Response helpers for hot list endpoints."""
+from typing import Any, Iterable, List, Type
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def serialize_rows(schema: Type[BaseModel], rows: Iterable[Any], **defaults: Any) -> List[dict]:
+    """
+    Copy the schema's fields off trusted ORM rows without Pydantic validation.
+
+    Args:
+        schema: Response schema whose fields are copied
+        rows: ORM objects loaded from the database
+        **defaults: Values used in place of None for the named fields
+
+    Returns:
+        List of plain dicts ready for ORJSONResponse
+    """
+    fields = tuple(schema.model_fields)
+    result = []
+    for row in rows:
+        item = {name: getattr(row, name) for name in fields}
+        for name, value in defaults.items():
+            if item[name] is None:
+                item[name] = value
+        result.append(item)
+    return result
@@ -1,6 +1,7 @@
 """Authentication endpoints."""
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models.user import User
@@ -32,15 +33,17 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
     
     # Create new user
     hashed_password = get_password_hash(user_data.password)
-    db_user = User(
-        email=user_data.email,
-        username=user_data.username,
-        full_name=user_data.full_name,
-        hashed_password=hashed_password,
-    )
-    db.add(db_user)
+    db_user = db.scalars(
+        insert(User).values(
+            email=user_data.email,
+            username=user_data.username,
+            full_name=user_data.full_name,
+            hashed_password=hashed_password,
+        ).returning(User)
+    ).one()
+    # Fully loaded from RETURNING; detached so the commit does not expire it
+    db.expunge(db_user)
     db.commit()
-    db.refresh(db_user)
     
     return db_user
 
@@ -1,39 +1,53 @@
 """Document endpoints."""
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
+from sqlalchemy.orm import Session, raiseload, load_only
 from typing import List, Optional
 from app.database import get_db
 from app.models.user import User
 from app.models.document import Document, DocumentStatus, DocumentType
 from app.schemas.document import DocumentCreate, DocumentResponse, DocumentChunkResponse
 from app.services.auth import get_current_active_user
-from app.services.storage import storage_service
-from app.workers.tasks import process_document_task
+from app.services.storage import storage_service, FileTooLargeError
+from app.services.ownership import get_owned_project, insert_if_project_owned
+from app.services.answer_cache import answer_cache
+from app.config import Settings, get_settings
+from app.api.responses import ORJSONResponse, serialize_rows
+from app.workers.tasks import enqueue_document
 import mimetypes
 from pathlib import Path
 
 router = APIRouter()
 
 
+_EXT_TO_TYPE = {
+    ".pdf": DocumentType.PDF,
+    ".html": DocumentType.HTML,
+    ".htm": DocumentType.HTML,
+    ".md": DocumentType.MARKDOWN,
+    ".markdown": DocumentType.MARKDOWN,
+    ".txt": DocumentType.TEXT,
+    ".docx": DocumentType.DOCX,
+}
+
+_MIME_TO_TYPE = {
+    "application/pdf": DocumentType.PDF,
+    "text/html": DocumentType.HTML,
+    "text/markdown": DocumentType.MARKDOWN,
+    "text/plain": DocumentType.TEXT,
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": DocumentType.DOCX,
+}
+
+
 def get_document_type(filename: str, mime_type: str) -> DocumentType:
-    """Determine document type from filename and MIME type."""
+    """Determine document type from filename, falling back to MIME type."""
     ext = Path(filename).suffix.lower()
-    
-    if ext == ".pdf" or mime_type == "application/pdf":
-        return DocumentType.PDF
-    elif ext in [".html", ".htm"] or mime_type == "text/html":
-        return DocumentType.HTML
-    elif ext in [".md", ".markdown"] or mime_type == "text/markdown":
-        return DocumentType.MARKDOWN
-    elif ext == ".txt" or mime_type == "text/plain":
-        return DocumentType.TEXT
-    elif ext == ".docx" or mime_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-        return DocumentType.DOCX
-    else:
+    doc_type = _EXT_TO_TYPE.get(ext) or _MIME_TO_TYPE.get(mime_type)
+    if doc_type is None:
         raise HTTPException(
             status_code=400,
             detail=f"Unsupported file type: {ext}",
         )
+    return doc_type
 
 
 @router.post("", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
@@ -44,29 +58,9 @@ async def upload_document(
     source_url: Optional[str] = Form(None),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db),
+    app_settings: Settings = Depends(get_settings),
 ):
     """Upload a document for processing."""
-    # Validate project ownership
-    from app.models.project import Project
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.user_id == current_user.id,
-    ).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    # Read file content
-    content = await file.read()
-    file_size = len(content)
-    
-    # Check file size limit (50MB default)
-    max_size = 50 * 1024 * 1024  # 50MB
-    if file_size > max_size:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File too large. Maximum size: {max_size / 1024 / 1024}MB",
-        )
-    
     # Determine document type
     try:
         mime_type = file.content_type or mimetypes.guess_type(file.filename)[0] or "application/octet-stream"
@@ -76,33 +70,68 @@ async def upload_document(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error determining file type: {str(e)}")
     
-    # Save file
+    # Reject uploads to projects the user does not own before the file is
+    # hashed or stored; the INSERT below re-checks ownership atomically
+    if not get_owned_project(db, project_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    # Hash the spooled upload, enforcing the size limit as bytes are read
+    max_size = app_settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
     try:
-        file_path = storage_service.save_file(content, file.filename)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
+        file_hash, file_size = await storage_service.run_io(
+            storage_service.digest_stream,
+            file.file,
+            max_size=max_size,
+        )
+    except FileTooLargeError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File too large. Maximum size: {app_settings.MAX_UPLOAD_SIZE_MB}MB",
+        )
     
-    # Create document record
-    db_document = Document(
+    # Reuse stored content if this user already uploaded the same file
+    existing = db.query(Document.file_path).filter(
+        Document.user_id == current_user.id,
+        Document.file_hash == file_hash,
+    ).first()
+    if existing:
+        file_path = existing.file_path
+    else:
+        try:
+            file_path, _ = await storage_service.save_stream_async(file.file, file.filename)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
+    
+    # Create document record, validating project ownership in the same statement
+    db_document = insert_if_project_owned(
+        db,
+        Document,
+        {
+            "project_id": project_id,
+            "user_id": current_user.id,
+            "filename": file_path,
+            "original_filename": file.filename,
+            "file_path": file_path,
+            "file_size": file_size,
+            "file_hash": file_hash,
+            "mime_type": mime_type,
+            "document_type": doc_type,
+            "title": title or Path(file.filename).stem,
+            "source_url": source_url,
+            "status": DocumentStatus.UPLOADED,
+        },
         project_id=project_id,
         user_id=current_user.id,
-        filename=file_path,
-        original_filename=file.filename,
-        file_path=file_path,
-        file_size=file_size,
-        mime_type=mime_type,
-        document_type=doc_type,
-        title=title or Path(file.filename).stem,
-        source_url=source_url,
-        status=DocumentStatus.UPLOADED,
     )
-    db.add(db_document)
+    if not db_document:
+        if not existing:
+            storage_service.delete_file(file_path)
+        raise HTTPException(status_code=404, detail="Project not found")
     db.commit()
-    db.refresh(db_document)
     
     # Trigger background processing
     try:
-        process_document_task.delay(db_document.id)
+        enqueue_document(db_document.id)
     except Exception as e:
         # Log error but don't fail the upload
         print(f"Error triggering background task: {str(e)}")
@@ -117,11 +146,12 @@ def list_documents(
     db: Session = Depends(get_db),
 ):
     """List documents. Optionally filter by project."""
-    query = db.query(Document).filter(Document.user_id == current_user.id)
+    # Responses serialize columns only; raiseload turns any lazy load into an error
+    query = db.query(Document).options(raiseload("*")).filter(Document.user_id == current_user.id)
     if project_id:
         query = query.filter(Document.project_id == project_id)
     documents = query.order_by(Document.created_at.desc()).all()
-    return documents
+    return ORJSONResponse(serialize_rows(DocumentResponse, documents))
 
 
 @router.get("/{document_id}", response_model=DocumentResponse)
@@ -143,10 +173,17 @@ def get_document(
 @router.get("/{document_id}/chunks", response_model=List[DocumentChunkResponse])
 def get_document_chunks(
     document_id: int,
+    after_index: Optional[int] = None,
+    limit: int = Query(500, ge=1, le=1000),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db),
 ):
-    """Get chunks for a specific document."""
+    """
+    Get chunks for a specific document, one page at a time.
+    
+    Pages are keyed on chunk_index: pass the last chunk_index of the previous
+    page as after_index to fetch the next page.
+    """
     # Verify document ownership
     document = db.query(Document).filter(
         Document.id == document_id,
@@ -156,10 +193,22 @@ def get_document_chunks(
         raise HTTPException(status_code=404, detail="Document not found")
     
     from app.models.document import DocumentChunk
-    chunks = db.query(DocumentChunk).filter(
-        DocumentChunk.document_id == document_id,
-    ).order_by(DocumentChunk.chunk_index).all()
-    return chunks
+    # Load the response fields only; this also undefers content
+    query = db.query(DocumentChunk).options(load_only(
+        DocumentChunk.id,
+        DocumentChunk.document_id,
+        DocumentChunk.content,
+        DocumentChunk.chunk_index,
+        DocumentChunk.page_number,
+        DocumentChunk.paragraph_number,
+        DocumentChunk.char_start,
+        DocumentChunk.char_end,
+        DocumentChunk.token_count,
+    )).filter(DocumentChunk.document_id == document_id)
+    if after_index is not None:
+        query = query.filter(DocumentChunk.chunk_index > after_index)
+    chunks = query.order_by(DocumentChunk.chunk_index).limit(limit).all()
+    return ORJSONResponse(serialize_rows(DocumentChunkResponse, chunks))
 
 
 @router.delete("/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -176,11 +225,19 @@ def delete_document(
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # Delete file from storage
-    storage_service.delete_file(document.file_path)
+    # Delete file from storage unless another upload of the same content uses it
+    shared = db.query(Document.id).filter(
+        Document.file_path == document.file_path,
+        Document.id != document.id,
+    ).first()
+    if not shared:
+        storage_service.delete_file(document.file_path)
     
     # Delete document (cascade will delete chunks)
+    project_id = document.project_id
     db.delete(document)
     db.commit()
+    # Cached answers may cite the deleted chunks
+    answer_cache.invalidate(project_id)
     return None
 
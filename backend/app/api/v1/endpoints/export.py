@@ -1,12 +1,15 @@
 """Export endpoints for generating summaries and references."""
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import Optional
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, raiseload
+from typing import Iterable, Iterator, Optional
+from urllib.parse import quote
 from app.database import get_db
 from app.models.user import User
 from app.models.project import Project
 from app.models.qa_session import QASession, QAResponse
 from app.services.auth import get_current_active_user
+from app.services.ownership import get_owned_project
 from datetime import datetime
 
 router = APIRouter()
@@ -21,48 +24,63 @@ def export_summary(
 ):
     """Export project summary with citations."""
     # Verify project ownership
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.user_id == current_user.id,
-    ).first()
+    project = get_owned_project(db, project_id, current_user.id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
     # Get all documents
     from app.models.document import Document
-    documents = db.query(Document).filter(Document.project_id == project_id).all()
-    
-    # Get all QA sessions and responses
-    sessions = db.query(QASession).filter(QASession.project_id == project_id).all()
-    all_responses = []
-    for session in sessions:
-        responses = db.query(QAResponse).filter(QAResponse.session_id == session.id).all()
-        all_responses.extend(responses)
+    documents = db.query(Document).options(raiseload("*")).filter(Document.project_id == project_id).all()
     
     if format == "markdown":
-        return _generate_markdown_summary(project, documents, all_responses)
+        # Responses are streamed from the database while the Markdown is sent
+        sessions = db.query(QASession).options(raiseload("*")).filter(QASession.project_id == project_id).all()
+        responses = db.query(QAResponse).options(raiseload("*")).join(QASession).filter(
+            QASession.project_id == project_id,
+        ).order_by(QAResponse.session_id, QAResponse.created_at).yield_per(100)
+        filename = f"{project.name}_summary.md"
+        return StreamingResponse(
+            _stream_markdown_summary(db, project, documents, sessions, responses),
+            media_type="text/markdown",
+            headers={"Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}"},
+        )
     elif format == "bibtex":
         return _generate_bibtex(project, documents)
     else:
         raise HTTPException(status_code=400, detail="Unsupported format. Use 'markdown' or 'bibtex'")
 
 
-def _generate_markdown_summary(project: Project, documents: list, responses: list) -> dict:
-    """Generate Markdown summary."""
-    lines = []
-    
+def _stream_markdown_summary(
+    db: Session,
+    project: Project,
+    documents: list,
+    sessions: list,
+    responses: Iterable,
+) -> Iterator[str]:
+    """Yield the Markdown summary and close the session once it is exhausted."""
+    try:
+        yield from _iter_markdown_summary(project, documents, sessions, responses)
+    finally:
+        db.close()
+
+
+def _iter_markdown_summary(
+    project: Project,
+    documents: list,
+    sessions: list,
+    responses: Iterable,
+) -> Iterator[str]:
+    """Generate Markdown summary, one block per document or response."""
     # Title
-    lines.append(f"# {project.name}")
-    lines.append("")
+    lines = [f"# {project.name}", ""]
     if project.description:
-        lines.append(project.description)
-        lines.append("")
+        lines.extend([project.description, ""])
     
     # Documents section
-    lines.append("## Documents")
-    lines.append("")
+    lines.extend(["## Documents", ""])
+    yield _block(lines)
     for doc in documents:
-        lines.append(f"- **{doc.title or doc.original_filename}**")
+        lines = [f"- **{doc.title or doc.original_filename}**"]
         if doc.author:
             lines.append(f"  - Author: {doc.author}")
         if doc.page_count:
@@ -71,51 +89,37 @@ def _generate_markdown_summary(project: Project, documents: list, responses: lis
             lines.append(f"  - Source: {doc.source_url}")
         lines.append(f"  - Uploaded: {doc.created_at.strftime('%Y-%m-%d')}")
         lines.append("")
+        yield _block(lines)
     
-    # QA Summary
-    if responses:
-        lines.append("## Research Questions and Answers")
-        lines.append("")
+    # QA Summary, grouped by session (sessions are already loaded by the caller)
+    sessions_dict = {session.id: session for session in sessions}
+    current_session = None
+    has_responses = False
+    for resp in responses:
+        lines = []
+        if not has_responses:
+            lines.extend(["## Research Questions and Answers", ""])
+            has_responses = True
         
-        # Group responses by session
-        sessions_dict = {}
-        db = SessionLocal()
-        for resp in responses:
-            if resp.session_id not in sessions_dict:
-                session = db.query(QASession).filter(QASession.id == resp.session_id).first()
-                sessions_dict[resp.session_id] = session
-        db.close()
+        session = sessions_dict.get(resp.session_id)
+        if session and session.id != current_session:
+            if current_session is not None:
+                lines.append("")
+            current_session = session.id if session else None
+            if session and session.title:
+                lines.extend([f"### {session.title}", ""])
         
-        current_session = None
-        for resp in responses:
-            session = sessions_dict.get(resp.session_id)
-            if session and session.id != current_session:
-                if current_session is not None:
-                    lines.append("")
-                current_session = session.id if session else None
-                if session and session.title:
-                    lines.append(f"### {session.title}")
-                    lines.append("")
-            
-            lines.append(f"**Q:** {resp.question}")
-            lines.append("")
-            lines.append(f"**A:** {resp.answer}")
+        lines.extend([f"**Q:** {resp.question}", "", f"**A:** {resp.answer}", ""])
+        
+        # Citations
+        if resp.citations:
+            lines.append("**Sources:**")
+            lines.extend([_format_citation(cit) for cit in resp.citations])
             lines.append("")
-            
-            # Citations
-            if resp.citations:
-                lines.append("**Sources:**")
-                for cit in resp.citations:
-                    page_str = f", Page {cit['page_number']}" if cit.get('page_number') else ""
-                    para_str = f", Paragraph {cit['paragraph_number']}" if cit.get('paragraph_number') else ""
-                    lines.append(f"- [{cit.get('document_filename', 'Unknown')}]{page_str}{para_str}")
-                    if cit.get('snippet'):
-                        lines.append(f"  > {cit['snippet'][:200]}...")
-                lines.append("")
+        yield _block(lines)
     
     # Bibliography
-    lines.append("## Bibliography")
-    lines.append("")
+    lines = ["## Bibliography", ""]
     for doc in documents:
         citation_line = f"- "
         if doc.author:
@@ -125,14 +129,26 @@ def _generate_markdown_summary(project: Project, documents: list, responses: lis
             citation_line += f". {doc.source_url}"
         citation_line += f" (Accessed: {doc.created_at.strftime('%Y-%m-%d')})"
         lines.append(citation_line)
-    
-    content = "\n".join(lines)
-    
-    return {
-        "content": content,
-        "filename": f"{project.name}_summary.md",
-        "mime_type": "text/markdown",
-    }
+    yield _block(lines)
+
+
+def _block(lines: list) -> str:
+    """Join lines into a newline-terminated block of Markdown."""
+    return "\n".join(lines) + "\n"
+
+
+def _format_citation(cit: dict) -> str:
+    """Format one citation as a Markdown list item, with its snippet if present."""
+    fname, page, para, snippet = (
+        cit.get('document_filename', 'Unknown'),
+        cit.get('page_number'),
+        cit.get('paragraph_number'),
+        cit.get('snippet'),
+    )
+    line = f"- [{fname}]{f', Page {page}' if page else ''}{f', Paragraph {para}' if para else ''}"
+    if snippet:
+        line += f"\n  > {snippet[:200]}..."
+    return line
 
 
 def _generate_bibtex(project: Project, documents: list) -> dict:
@@ -1,12 +1,14 @@
 """Project endpoints."""
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, raiseload
 from typing import List
 from app.database import get_db
 from app.models.user import User
 from app.models.project import Project
 from app.schemas.project import ProjectCreate, ProjectUpdate, ProjectResponse
 from app.services.auth import get_current_active_user
+from app.services.ownership import get_owned_project
 
 router = APIRouter()
 
@@ -18,14 +20,16 @@ def create_project(
     db: Session = Depends(get_db),
 ):
     """Create a new project."""
-    db_project = Project(
-        name=project_data.name,
-        description=project_data.description,
-        user_id=current_user.id,
-    )
-    db.add(db_project)
+    db_project = db.scalars(
+        insert(Project).values(
+            name=project_data.name,
+            description=project_data.description,
+            user_id=current_user.id,
+        ).returning(Project)
+    ).one()
+    # Fully loaded from RETURNING; detached so the commit does not expire it
+    db.expunge(db_project)
     db.commit()
-    db.refresh(db_project)
     return db_project
 
 
@@ -35,7 +39,8 @@ def list_projects(
     db: Session = Depends(get_db),
 ):
     """List all projects for current user."""
-    projects = db.query(Project).filter(Project.user_id == current_user.id).all()
+    # Responses serialize columns only; raiseload turns any lazy load into an error
+    projects = db.query(Project).options(raiseload("*")).filter(Project.user_id == current_user.id).all()
     return projects
 
 
@@ -46,10 +51,7 @@ def get_project(
     db: Session = Depends(get_db),
 ):
     """Get a specific project."""
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.user_id == current_user.id,
-    ).first()
+    project = get_owned_project(db, project_id, current_user.id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     return project
@@ -63,10 +65,7 @@ def update_project(
     db: Session = Depends(get_db),
 ):
     """Update a project."""
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.user_id == current_user.id,
-    ).first()
+    project = get_owned_project(db, project_id, current_user.id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
@@ -86,10 +85,7 @@ def delete_project(
     db: Session = Depends(get_db),
 ):
     """Delete a project."""
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.user_id == current_user.id,
-    ).first()
+    project = get_owned_project(db, project_id, current_user.id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
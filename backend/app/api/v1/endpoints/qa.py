@@ -1,7 +1,9 @@
 """QA endpoints."""
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, selectinload, raiseload
+from typing import Iterator, List, Optional, Tuple
 from app.database import get_db
 from app.models.user import User
 from app.models.qa_session import QASession, QAResponse as QAResponseModel
@@ -10,10 +12,12 @@ from app.schemas.qa import (
     QASessionResponse,
     QuestionRequest,
     QAResponseSchema,
+    StreamChunk,
 )
 from app.services.auth import get_current_active_user
 from app.services.rag import rag_service
-from datetime import datetime
+from app.services.ownership import insert_if_project_owned
+from app.api.responses import ORJSONResponse, serialize_rows
 
 router = APIRouter()
 
@@ -25,24 +29,22 @@ def create_session(
     db: Session = Depends(get_db),
 ):
     """Create a new QA session."""
-    # Verify project ownership
-    from app.models.project import Project
-    project = db.query(Project).filter(
-        Project.id == session_data.project_id,
-        Project.user_id == current_user.id,
-    ).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    db_session = QASession(
+    # Insert the session, verifying project ownership in the same statement
+    db_session = insert_if_project_owned(
+        db,
+        QASession,
+        {
+            "project_id": session_data.project_id,
+            "user_id": current_user.id,
+            "title": session_data.title,
+            "context": session_data.context,
+        },
         project_id=session_data.project_id,
         user_id=current_user.id,
-        title=session_data.title,
-        context=session_data.context,
     )
-    db.add(db_session)
+    if not db_session:
+        raise HTTPException(status_code=404, detail="Project not found")
     db.commit()
-    db.refresh(db_session)
     return db_session
 
 
@@ -53,11 +55,12 @@ def list_sessions(
     db: Session = Depends(get_db),
 ):
     """List QA sessions. Optionally filter by project."""
-    query = db.query(QASession).filter(QASession.user_id == current_user.id)
+    # Responses serialize columns only; raiseload turns any lazy load into an error
+    query = db.query(QASession).options(raiseload("*")).filter(QASession.user_id == current_user.id)
     if project_id:
         query = query.filter(QASession.project_id == project_id)
     sessions = query.order_by(QASession.updated_at.desc()).all()
-    return sessions
+    return ORJSONResponse(serialize_rows(QASessionResponse, sessions))
 
 
 @router.get("/sessions/{session_id}", response_model=QASessionResponse)
@@ -83,6 +86,69 @@ def ask_question(
     db: Session = Depends(get_db),
 ):
     """Ask a question and get an answer with citations."""
+    session_id, project_id = _resolve_session(question_data, current_user, db)
+    contexts = _retrieve_contexts(question_data, project_id)
+    
+    # Generate answer
+    try:
+        result = rag_service.generate_answer(
+            question=question_data.question,
+            contexts=contexts,
+            project_id=project_id,
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error generating answer: {str(e)}",
+        )
+    
+    inserted = _save_response(db, session_id, question_data.question, result)
+    
+    # Format response
+    return QAResponseSchema(
+        id=inserted.id,
+        session_id=session_id,
+        question=question_data.question,
+        answer=result["answer"],
+        citations=result["citations"],
+        retrieved_chunk_ids=result["retrieved_chunks"] or [],
+        model_used=rag_service.model_name,
+        tokens_used=None,
+        created_at=inserted.created_at,
+    )
+
+
+@router.post("/ask/stream")
+def ask_question_stream(
+    question_data: QuestionRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Ask a question and stream the answer as server-sent events.
+    
+    Each event is a StreamChunk: "token" events carry answer text as it is
+    generated, then a "citation" event carries the parsed citations and a
+    "done" event the final answer.
+    """
+    session_id, project_id = _resolve_session(question_data, current_user, db)
+    contexts = _retrieve_contexts(question_data, project_id)
+    if not rag_service.client:
+        raise HTTPException(status_code=500, detail="Error generating answer: LLM not configured")
+    
+    return StreamingResponse(
+        _stream_answer(db, session_id, question_data.question, contexts),
+        media_type="text/event-stream",
+    )
+
+
+def _resolve_session(question_data: QuestionRequest, current_user: User, db: Session) -> Tuple[int, int]:
+    """
+    Find the question's session, creating one when only a project is given.
+    
+    Returns:
+        Tuple of (session_id, project_id)
+    """
     # Determine project_id and session_id
     project_id = question_data.project_id
     session_id = question_data.session_id
@@ -97,34 +163,32 @@ def ask_question(
             raise HTTPException(status_code=404, detail="Session not found")
         project_id = session.project_id
     elif project_id:
-        # Verify project ownership
-        from app.models.project import Project
-        project = db.query(Project).filter(
-            Project.id == project_id,
-            Project.user_id == current_user.id,
-        ).first()
-        if not project:
+        # Create a new session, verifying project ownership in the same statement
+        session = insert_if_project_owned(
+            db,
+            QASession,
+            {
+                "project_id": project_id,
+                "user_id": current_user.id,
+                "title": question_data.question[:100],  # Use first 100 chars as title
+            },
+            project_id=project_id,
+            user_id=current_user.id,
+        )
+        if not session:
             raise HTTPException(status_code=404, detail="Project not found")
+        db.commit()
+        session_id = session.id
     else:
         raise HTTPException(
             status_code=400,
             detail="Either project_id or session_id must be provided",
         )
-    
-    # Get or create session
-    if not session_id:
-        # Create new session
-        session = QASession(
-            project_id=project_id,
-            user_id=current_user.id,
-            title=question_data.question[:100],  # Use first 100 chars as title
-        )
-        db.add(session)
-        db.commit()
-        db.refresh(session)
-        session_id = session.id
-    
-    # Retrieve context using RAG
+    return session_id, project_id
+
+
+def _retrieve_contexts(question_data: QuestionRequest, project_id: int) -> List[dict]:
+    """Retrieve context using RAG, raising 404 when nothing relevant is indexed."""
     try:
         contexts = rag_service.retrieve_context(
             question=question_data.question,
@@ -142,49 +206,46 @@ def ask_question(
             status_code=404,
             detail="No relevant documents found. Please upload documents first.",
         )
-    
-    # Generate answer
+    return contexts
+
+
+def _save_response(db: Session, session_id: int, question: str, result: dict):
+    """Save response; a trigger on qa_responses bumps the session's updated_at."""
+    inserted = db.execute(
+        insert(QAResponseModel).values(
+            session_id=session_id,
+            question=question,
+            answer=result["answer"],
+            citations=result["citations"],
+            retrieved_chunk_ids=result["retrieved_chunks"],
+            model_used=rag_service.model_name,
+        ).returning(QAResponseModel.id, QAResponseModel.created_at)
+    ).one()
+    db.commit()
+    return inserted
+
+
+def _stream_answer(db: Session, session_id: int, question: str, contexts: List[dict]) -> Iterator[str]:
+    """Yield SSE events for a streamed answer, then save it and close the session."""
     try:
-        result = rag_service.generate_answer(
-            question=question_data.question,
-            contexts=contexts,
-        )
+        for event in rag_service.generate_answer_stream(question, contexts):
+            if "delta" in event:
+                yield _sse(StreamChunk(type="token", content=event["delta"]))
+            else:
+                result = event["result"]
+                _save_response(db, session_id, question, result)
+                yield _sse(StreamChunk(type="citation", citations=result["citations"]))
+                yield _sse(StreamChunk(type="done", content=result["answer"]))
     except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error generating answer: {str(e)}",
-        )
-    
-    # Save response to database
-    db_response = QAResponseModel(
-        session_id=session_id,
-        question=question_data.question,
-        answer=result["answer"],
-        citations=result["citations"],
-        retrieved_chunk_ids=result["retrieved_chunks"],
-        model_used=rag_service.llm.model_name if rag_service.llm else None,
-    )
-    db.add(db_response)
-    
-    # Update session timestamp
-    session = db.query(QASession).filter(QASession.id == session_id).first()
-    session.updated_at = datetime.utcnow()
-    
-    db.commit()
-    db.refresh(db_response)
-    
-    # Format response
-    return QAResponseSchema(
-        id=db_response.id,
-        session_id=db_response.session_id,
-        question=db_response.question,
-        answer=db_response.answer,
-        citations=result["citations"],
-        retrieved_chunk_ids=db_response.retrieved_chunk_ids or [],
-        model_used=db_response.model_used,
-        tokens_used=db_response.tokens_used,
-        created_at=db_response.created_at,
-    )
+        # Headers are already sent, so errors are reported in-stream
+        yield _sse(StreamChunk(type="error", content=f"Error generating answer: {str(e)}"))
+    finally:
+        db.close()
+
+
+def _sse(chunk: StreamChunk) -> str:
+    """Format a stream chunk as one server-sent event."""
+    return f"data: {chunk.model_dump_json(exclude_none=True)}\n\n"
 
 
 @router.get("/sessions/{session_id}/responses", response_model=List[QAResponseSchema])
@@ -194,32 +255,21 @@ def get_session_responses(
     db: Session = Depends(get_db),
 ):
     """Get all responses for a QA session."""
-    # Verify session ownership
-    session = db.query(QASession).filter(
+    # Verify session ownership; responses are loaded in one SELECT ... IN batch
+    session = db.query(QASession).options(
+        selectinload(QASession.responses),
+        raiseload("*"),
+    ).filter(
         QASession.id == session_id,
         QASession.user_id == current_user.id,
     ).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    responses = db.query(QAResponseModel).filter(
-        QAResponseModel.session_id == session_id,
-    ).order_by(QAResponseModel.created_at).all()
-    
-    # Convert to response schema
-    result = []
-    for resp in responses:
-        result.append(QAResponseSchema(
-            id=resp.id,
-            session_id=resp.session_id,
-            question=resp.question,
-            answer=resp.answer,
-            citations=resp.citations if resp.citations else [],
-            retrieved_chunk_ids=resp.retrieved_chunk_ids or [],
-            model_used=resp.model_used,
-            tokens_used=resp.tokens_used,
-            created_at=resp.created_at,
-        ))
-    
-    return result
+    return ORJSONResponse(serialize_rows(
+        QAResponseSchema,
+        session.responses,
+        citations=[],
+        retrieved_chunk_ids=[],
+    ))
 
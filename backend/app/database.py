@@ -1,15 +1,31 @@
 """Database connection and session management."""
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+import orjson
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
 
+# psycopg2 batches executemany() UPDATEs (e.g. bulk chunk updates) as well as
+# multi-row INSERTs; other drivers don't take the option
+_driver_options = {}
+if make_url(settings.DATABASE_URL).get_driver_name() == "psycopg2":
+    _driver_options["executemany_mode"] = "values_plus_batch"
+
 # Create database engine
 engine = create_engine(
     settings.DATABASE_URL,
+    **_driver_options,
     pool_pre_ping=True,
     pool_size=10,
     max_overflow=20,
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+    # JSON columns (citations, retrieved chunk ids) go through orjson
+    json_serializer=lambda value: orjson.dumps(value).decode(),
+    json_deserializer=orjson.loads,
 )
 
 # Create session factory
@@ -18,6 +34,64 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base class for models
 Base = declarative_base()
 
+# Statements executed in the current count_queries() block, if any
+_query_log: ContextVar[Optional[List[str]]] = ContextVar("query_log", default=None)
+
+
+@contextmanager
+def count_queries() -> Iterator[List[str]]:
+    """
+    Record the SQL statements executed inside the block.
+    
+    Statements are only recorded once enable_query_counting() has run, which
+    happens at import when DEBUG is enabled, so production pays nothing for
+    this.
+    
+    Returns:
+        List that receives each statement as it is executed
+    """
+    statements: List[str] = []
+    token = _query_log.set(statements)
+    try:
+        yield statements
+    finally:
+        _query_log.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[List[str]]:
+    """
+    Fail if the block executes more than ``limit`` SQL statements.
+    
+    Installs the statement listener if DEBUG has not, so the check never
+    passes just because nothing was counted.
+    
+    Args:
+        limit: Maximum number of statements allowed
+    """
+    enable_query_counting()
+    with count_queries() as statements:
+        yield statements
+    assert len(statements) <= limit, (
+        f"Expected at most {limit} queries, got {len(statements)}:\n" + "\n".join(statements)
+    )
+
+
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    statements = _query_log.get()
+    if statements is not None:
+        statements.append(statement)
+
+
+def enable_query_counting() -> None:
+    """Install the listener behind count_queries() on every engine; idempotent."""
+    if not event.contains(Engine, "before_cursor_execute", _record_query):
+        event.listen(Engine, "before_cursor_execute", _record_query)
+
+
+if settings.DEBUG:
+    enable_query_counting()
+
 
 def get_db():
     """Dependency for getting database session."""
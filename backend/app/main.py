@@ -1,7 +1,8 @@
 """FastAPI application entry point."""
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
+from app.database import count_queries
 from app.api.v1.router import api_router
 
 app = FastAPI(
@@ -20,6 +21,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.DEBUG:
+    @app.middleware("http")
+    async def query_count_header(request: Request, call_next):
+        """Report the number of SQL statements a request ran (N+1 detection)."""
+        with count_queries() as statements:
+            response = await call_next(request)
+        response.headers["X-Query-Count"] = str(len(statements))
+        return response
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 
@@ -1,7 +1,9 @@
 """Document and document chunk models."""
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum, Float
+from typing import Dict, Type
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, ForeignKey, Text, Float, Index, CheckConstraint, Uuid, text
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 import enum
 from app.database import Base
 
@@ -23,10 +25,59 @@ class DocumentType(str, enum.Enum):
     DOCX = "docx"
 
 
+# SMALLINT codes stored for each member; append new codes, never renumber
+STATUS_CODES = {
+    DocumentStatus.UPLOADED: 0,
+    DocumentStatus.PROCESSING: 1,
+    DocumentStatus.INDEXED: 2,
+    DocumentStatus.FAILED: 3,
+}
+TYPE_CODES = {
+    DocumentType.PDF: 0,
+    DocumentType.HTML: 1,
+    DocumentType.MARKDOWN: 2,
+    DocumentType.TEXT: 3,
+    DocumentType.DOCX: 4,
+}
+
+
+class CodedEnum(TypeDecorator):
+    """Persist a str enum as a SMALLINT code; Python code and the API keep seeing members."""
+    
+    impl = SmallInteger
+    cache_ok = True
+    
+    def __init__(self, enum_class: Type[enum.Enum], codes: Dict[enum.Enum, int]):
+        super().__init__()
+        self.enum_class = enum_class
+        self.codes = tuple(codes.items())  # Hashable, for the statement cache key
+        self._code_of = dict(codes)
+        self._member_of = {code: member for member, code in codes.items()}
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return self._code_of[self.enum_class(value)]
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return self._member_of[value]
+
+
 class Document(Base):
     """Document model for storing uploaded files and metadata."""
     
     __tablename__ = "documents"
+    __table_args__ = (
+        Index("ix_documents_user_project", "user_id", "project_id", "created_at"),
+        Index("ix_documents_user_file_hash", "user_id", "file_hash"),
+        Index("ix_documents_project_status", "project_id", "status"),
+        Index("ix_documents_user_created", "user_id", "created_at"),
+        Index("ix_documents_indexed_only", "project_id", postgresql_where=text(f"status = {STATUS_CODES[DocumentStatus.INDEXED]}")),
+        CheckConstraint(f"status BETWEEN 0 AND {len(STATUS_CODES) - 1}", name="ck_documents_status"),
+        CheckConstraint(f"document_type BETWEEN 0 AND {len(TYPE_CODES) - 1}", name="ck_documents_document_type"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
@@ -37,8 +88,9 @@ class Document(Base):
     original_filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
     file_size = Column(Integer, nullable=False)  # in bytes
+    file_hash = Column(String(64), nullable=True)  # SHA-256 of content, for dedupe
     mime_type = Column(String, nullable=False)
-    document_type = Column(Enum(DocumentType), nullable=False)
+    document_type = Column(CodedEnum(DocumentType, TYPE_CODES), nullable=False)
     
     # Content metadata
     title = Column(String, nullable=True)
@@ -46,7 +98,7 @@ class Document(Base):
     page_count = Column(Integer, nullable=True)
     
     # Processing status
-    status = Column(Enum(DocumentStatus), default=DocumentStatus.UPLOADED, nullable=False)
+    status = Column(CodedEnum(DocumentStatus, STATUS_CODES), default=DocumentStatus.UPLOADED, nullable=False)
     processing_error = Column(Text, nullable=True)
     
     # Source information
@@ -63,15 +115,25 @@ class Document(Base):
 
 
 class DocumentChunk(Base):
-    """Document chunk model for storing text chunks with embedding metadata."""
+    """
+    Document chunk model for storing text chunks with embedding metadata.
+    
+    Documents can have thousands of chunks: write them in bulk with
+    db.execute(insert(DocumentChunk), [dict, ...]) and read them with keyset
+    pagination on chunk_index rather than loading them all at once.
+    """
     
     __tablename__ = "document_chunks"
+    __table_args__ = (
+        Index("ix_document_chunks_document_chunk", "document_id", "chunk_index"),
+        Index("ix_document_chunks_embedding_id", "embedding_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
     
-    # Chunk content
-    content = Column(Text, nullable=False)
+    # Chunk content; deferred so metadata queries (and cascade deletes) skip it
+    content = deferred(Column(Text, nullable=False))
     chunk_index = Column(Integer, nullable=False)  # Order within document
     
     # Citation metadata for precise source tracking
@@ -79,9 +141,10 @@ class DocumentChunk(Base):
     paragraph_number = Column(Integer, nullable=True)  # Paragraph index
     char_start = Column(Integer, nullable=True)  # Character start position in original
     char_end = Column(Integer, nullable=True)  # Character end position in original
+    token_count = Column(Integer, nullable=True)  # Embedding-model tokens, when chunked by token
     
     # Embedding metadata
-    embedding_id = Column(String, nullable=True)  # ID in vector DB
+    embedding_id = Column(Uuid, nullable=True)  # ID in vector DB, which stores it as a string
     embedding_model = Column(String, nullable=True)
     
     # Retrieval metadata
@@ -1,14 +1,21 @@
 """QA session and response models."""
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
 
+# JSONB on Postgres (parsed binary form, indexable); plain JSON elsewhere
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
 
 class QASession(Base):
     """QA session model to track conversation context."""
     
     __tablename__ = "qa_sessions"
+    __table_args__ = (
+        Index("ix_qa_sessions_user_project", "user_id", "project_id", "updated_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
@@ -20,17 +27,30 @@ class QASession(Base):
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())  # Also bumped by a trigger on qa_responses inserts
     
     # Relationships
     project = relationship("Project", back_populates="qa_sessions")
-    responses = relationship("QAResponse", back_populates="session", cascade="all, delete-orphan")
+    responses = relationship(
+        "QAResponse",
+        back_populates="session",
+        cascade="all, delete-orphan",
+        order_by="QAResponse.created_at",
+    )
 
 
 class QAResponse(Base):
     """QA response model for storing question-answer pairs with citations."""
     
     __tablename__ = "qa_responses"
+    __table_args__ = (
+        Index("ix_qa_responses_session_created", "session_id", "created_at"),
+        # Serves containment filters such as citations @> '[{"document_id": 42}]'
+        Index(
+            "ix_qa_responses_citations_gin", "citations",
+            postgresql_using="gin", postgresql_ops={"citations": "jsonb_path_ops"},
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("qa_sessions.id"), nullable=False)
@@ -39,12 +59,12 @@ class QAResponse(Base):
     question = Column(Text, nullable=False)
     answer = Column(Text, nullable=False)
     
-    # Citations - stored as JSON for flexibility
+    # Citations - stored as JSONB for flexibility
     # Format: [{"chunk_id": 1, "document_id": 1, "page": 2, "paragraph": 3, "snippet": "..."}, ...]
-    citations = Column(JSON, nullable=False, default=list)
+    citations = Column(JSONType, nullable=False, default=list)
     
     # Retrieval metadata
-    retrieved_chunk_ids = Column(JSON, nullable=True)  # IDs of chunks used
+    retrieved_chunk_ids = Column(JSONType, nullable=True)  # IDs of chunks used
     model_used = Column(String, nullable=True)
     tokens_used = Column(Integer, nullable=True)
     
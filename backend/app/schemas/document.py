@@ -1,5 +1,5 @@
 """Document schemas."""
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List
 from datetime import datetime
 from app.models.document import DocumentStatus, DocumentType
@@ -41,8 +41,7 @@ class DocumentResponse(DocumentBase):
     updated_at: Optional[datetime] = None
     indexed_at: Optional[datetime] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class DocumentChunkResponse(BaseModel):
@@ -55,7 +54,7 @@ class DocumentChunkResponse(BaseModel):
     paragraph_number: Optional[int] = None
     char_start: Optional[int] = None
     char_end: Optional[int] = None
+    token_count: Optional[int] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
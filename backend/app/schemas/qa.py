@@ -1,5 +1,5 @@
 """QA schemas."""
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List, Dict
 from datetime import datetime
 
@@ -34,8 +34,7 @@ class QASessionResponse(BaseModel):
     created_at: datetime
     updated_at: Optional[datetime] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class QuestionRequest(BaseModel):
@@ -58,13 +57,12 @@ class QAResponseSchema(BaseModel):
     tokens_used: Optional[int] = None
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class StreamChunk(BaseModel):
     """Streaming response chunk."""
-    type: str  # "token", "citation", "done"
+    type: str  # "token", "citation", "done", "error"
     content: Optional[str] = None
     citations: Optional[List[Citation]] = None
 
@@ -0,0 +1,101 @@
+"""In-process cache of generated answers keyed by question similarity."""
+from typing import Collection, Dict, List, Optional, Tuple
+import threading
+import time
+import numpy as np
+from app.config import settings
+
+
+class AnswerCache:
+    """
+    Cache answers per project and reuse them for near-duplicate questions.
+    
+    Question embeddings are L2-normalized, so a matrix-vector product gives
+    the cosine similarity to every cached question at once.
+    """
+    
+    def __init__(self):
+        self.enabled = settings.ANSWER_CACHE_ENABLED
+        self.threshold = settings.ANSWER_CACHE_THRESHOLD
+        self.ttl = settings.ANSWER_CACHE_TTL
+        self.max_entries = settings.ANSWER_CACHE_SIZE
+        self._lock = threading.Lock()
+        # project_id -> (question embeddings, [(expires_at, result), ...]) in insertion order
+        self._projects: Dict[int, Tuple[np.ndarray, List[Tuple[float, Dict]]]] = {}
+    
+    def get(
+        self,
+        project_id: int,
+        embedding: np.ndarray,
+        chunk_ids: Optional[Collection[str]] = None,
+    ) -> Optional[Dict]:
+        """
+        Look up the answer to the most similar cached question.
+        
+        Args:
+            project_id: Project the question was asked in
+            embedding: L2-normalized question embedding
+            chunk_ids: Chunks retrieved for the question now; when given, only
+                answers built from a subset of them are reused, so answers
+                citing deleted, reindexed or unretrieved chunks are skipped
+        
+        Returns:
+            The cached result, or None if no live entry is similar enough
+        """
+        with self._lock:
+            # Expired rows are pruned first, so they can never win the argmax
+            entry = self._live_entry(project_id, time.monotonic())
+            if entry is None:
+                return None
+            vectors, results = entry
+            similarities = vectors @ np.asarray(embedding, dtype=np.float32)
+            for index in np.argsort(-similarities):
+                if similarities[index] < self.threshold:
+                    break
+                result = results[index][1]
+                if chunk_ids is None or set(result["retrieved_chunks"]) <= set(chunk_ids):
+                    return result
+            return None
+    
+    def put(self, project_id: int, embedding: np.ndarray, result: Dict) -> None:
+        """
+        Store a generated result, evicting expired and then oldest entries.
+        
+        Args:
+            project_id: Project the question was asked in
+            embedding: L2-normalized question embedding
+            result: Result returned by RAGService.generate_answer
+        """
+        now = time.monotonic()
+        vector = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        with self._lock:
+            vectors, results = self._live_entry(project_id, now) or (np.empty((0, vector.shape[1]), dtype=np.float32), [])
+            start = max(len(results) - self.max_entries + 1, 0)
+            self._projects[project_id] = (
+                np.vstack([vectors[start:], vector]),
+                results[start:] + [(now + self.ttl, result)],
+            )
+    
+    def invalidate(self, project_id: int) -> None:
+        """Drop every cached answer for a project, e.g. after one of its documents is deleted."""
+        with self._lock:
+            self._projects.pop(project_id, None)
+    
+    def _live_entry(self, project_id: int, now: float) -> Optional[Tuple[np.ndarray, List[Tuple[float, Dict]]]]:
+        """Drop a project's expired entries and return what is left; the caller holds the lock."""
+        entry = self._projects.get(project_id)
+        if entry is None:
+            return None
+        vectors, results = entry
+        keep = [i for i, (expires_at, _) in enumerate(results) if expires_at > now]
+        if len(keep) == len(results):
+            return entry
+        if not keep:
+            del self._projects[project_id]
+            return None
+        entry = (vectors[keep], [results[i] for i in keep])
+        self._projects[project_id] = entry
+        return entry
+
+
+answer_cache = AnswerCache()
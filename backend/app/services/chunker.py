@@ -1,14 +1,40 @@
 """Text chunking service with overlap and metadata tracking."""
-from typing import List, Dict, Optional
-from app.config import settings
+from bisect import bisect_left
+from functools import lru_cache
+from typing import List, Dict, Optional, Sequence, Tuple
+import re
+from app.config import RUNTIME
+
+# Characters treated as sentence boundaries when choosing split points
+_BOUNDARY_RE = re.compile(r"[.\n?!]")
+# A paragraph: stripped text containing no blank-line ("\n\n") separator
+_PARA_RE = re.compile(r"\S(?:[^\n]|\n(?!\n))*\S|\S")
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    """Return the (cached) tiktoken encoding for a model, defaulting to cl100k_base."""
+    import tiktoken
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
 
 
 class Chunker:
     """Service for chunking text with overlap and preserving metadata."""
     
     def __init__(self, chunk_size: int = None, chunk_overlap: int = None):
-        self.chunk_size = chunk_size or settings.CHUNK_SIZE
-        self.chunk_overlap = chunk_overlap or settings.CHUNK_OVERLAP
+        self.chunk_size = chunk_size or RUNTIME.chunk_size
+        self.chunk_overlap = chunk_overlap or RUNTIME.chunk_overlap
+        # In token mode, sizes count embedding-model tokens instead of characters
+        self._encoding = get_encoding(RUNTIME.embed_model) if RUNTIME.chunk_unit == "tokens" else None
+        # Large paragraphs are split by the Rust splitter when enabled; the
+        # Python path stays available for debugging
+        self._splitter = None
+        if RUNTIME.chunker_backend == "rust":
+            from semantic_text_splitter import TextSplitter
+            self._splitter = TextSplitter(capacity=self.chunk_size, overlap=self.chunk_overlap)
     
     def chunk_text(
         self,
@@ -20,159 +46,226 @@ class Chunker:
         """
         Chunk text with overlap and preserve citation metadata.
         
+        Chunks are tracked as (start, end) offsets into ``text`` and only
+        sliced out once when emitted, so char_start/char_end are exact.
+        
         Args:
             text: Text to chunk
             page_number: Page number (for PDFs)
             char_offset: Character offset in original document
             paragraph_number: Paragraph number
-            
+        
         Returns:
             List of chunk dictionaries with metadata
         """
         if not text or len(text.strip()) == 0:
             return []
         
+        if self._encoding is not None:
+            return self._chunk_tokens(text, page_number, char_offset, paragraph_number)
+        
         chunks = []
-        text_length = len(text)
         
         # Split by paragraphs first for better chunking
-        paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
+        spans = (m.span() for m in _PARA_RE.finditer(text))
+        # Sentence boundaries, found once and then looked up by bisection
+        boundaries = [m.start() for m in _BOUNDARY_RE.finditer(text)]
         
-        current_chunk = ""
-        current_char_start = char_offset
-        chunk_index = 0
+        # Span of the chunk being built; cur_start is None when it is empty
+        cur_start: Optional[int] = None
+        cur_end = 0
+        cur_para = 0
         
-        for para_idx, paragraph in enumerate(paragraphs):
-            # If adding this paragraph exceeds chunk size, save current chunk
-            if current_chunk and len(current_chunk) + len(paragraph) + 2 > self.chunk_size:
-                # Save current chunk
-                chunks.append({
-                    "content": current_chunk.strip(),
-                    "chunk_index": chunk_index,
-                    "page_number": page_number,
-                    "paragraph_number": paragraph_number if paragraph_number is not None else para_idx,
-                    "char_start": current_char_start,
-                    "char_end": current_char_start + len(current_chunk),
-                })
-                
-                # Start new chunk with overlap
-                overlap_text = self._get_overlap_text(current_chunk, self.chunk_overlap)
-                current_chunk = overlap_text + "\n\n" + paragraph if overlap_text else paragraph
-                current_char_start = char_offset + (chunks[-1]["char_end"] - len(overlap_text)) if overlap_text else char_offset
-                chunk_index += 1
+        for para_idx, (para_start, para_end) in enumerate(spans):
+            para_num = paragraph_number if paragraph_number is not None else para_idx
             
             # If single paragraph exceeds chunk size, split it
-            elif len(paragraph) > self.chunk_size:
+            if para_end - para_start > self.chunk_size:
                 # First, save current chunk if exists
-                if current_chunk:
-                    chunks.append({
-                        "content": current_chunk.strip(),
-                        "chunk_index": chunk_index,
-                        "page_number": page_number,
-                        "paragraph_number": paragraph_number if paragraph_number is not None else para_idx,
-                        "char_start": current_char_start,
-                        "char_end": current_char_start + len(current_chunk),
-                    })
-                    chunk_index += 1
+                if cur_start is not None:
+                    chunks.append(self._make_chunk(
+                        text, cur_start, cur_end, len(chunks), page_number,
+                        paragraph_number if paragraph_number is not None else cur_para, char_offset,
+                    ))
                 
                 # Split large paragraph
                 para_chunks = self._split_large_text(
-                    paragraph,
-                    chunk_index,
-                    page_number,
-                    paragraph_number if paragraph_number is not None else para_idx,
-                    current_char_start if not current_chunk else chunks[-1]["char_end"] - self.chunk_overlap,
+                    text, boundaries, para_start, para_end, len(chunks), page_number, para_num, char_offset,
                 )
                 chunks.extend(para_chunks)
-                chunk_index += len(para_chunks)
                 
                 # Start new chunk with overlap
-                if para_chunks:
-                    current_chunk = self._get_overlap_text(para_chunks[-1]["content"], self.chunk_overlap)
-                    current_char_start = para_chunks[-1]["char_end"] - len(current_chunk) if current_chunk else para_chunks[-1]["char_end"]
-                else:
-                    current_chunk = ""
-                    current_char_start = char_offset
+                cur_end = para_end
+                cur_start = self._overlap_start(text, boundaries, para_chunks[-1]["char_start"] - char_offset, cur_end)
+                cur_para = para_idx
+            
+            # If adding this paragraph exceeds chunk size, save current chunk
+            elif cur_start is not None and para_end - cur_start > self.chunk_size:
+                chunks.append(self._make_chunk(
+                    text, cur_start, cur_end, len(chunks), page_number,
+                    paragraph_number if paragraph_number is not None else cur_para, char_offset,
+                ))
+                
+                # Start new chunk with overlap
+                overlap_start = self._overlap_start(text, boundaries, cur_start, cur_end)
+                cur_start = overlap_start if overlap_start is not None else para_start
+                cur_end = para_end
+                cur_para = para_idx
             else:
                 # Add paragraph to current chunk
-                if current_chunk:
-                    current_chunk += "\n\n" + paragraph
-                else:
-                    current_chunk = paragraph
-                    current_char_start = char_offset
+                if cur_start is None:
+                    cur_start = para_start
+                    cur_para = para_idx
+                cur_end = para_end
         
         # Save last chunk
-        if current_chunk.strip():
-            chunks.append({
-                "content": current_chunk.strip(),
-                "chunk_index": chunk_index,
-                "page_number": page_number,
-                "paragraph_number": paragraph_number if paragraph_number is not None else len(paragraphs) - 1,
-                "char_start": current_char_start,
-                "char_end": current_char_start + len(current_chunk),
-            })
+        if cur_start is not None:
+            chunks.append(self._make_chunk(
+                text, cur_start, cur_end, len(chunks), page_number,
+                paragraph_number if paragraph_number is not None else cur_para, char_offset,
+            ))
+        
+        return chunks
+    
+    def _chunk_tokens(
+        self,
+        text: str,
+        page_number: Optional[int],
+        char_offset: int,
+        paragraph_number: Optional[int],
+    ) -> List[Dict]:
+        """
+        Chunk text into windows of chunk_size tokens overlapping by chunk_overlap.
+        
+        The text is tokenized once; token character offsets map each window
+        back onto text, so chunks keep exact char_start/char_end and carry
+        their token_count.
+        """
+        tokens = self._encoding.encode_ordinary(text)
+        _, offsets = self._encoding.decode_with_offsets(tokens)
+        # Character offset of each token boundary; the last is the end of text
+        offsets.append(len(text))
+        step = max(self.chunk_size - self.chunk_overlap, 1)
+        
+        chunks = []
+        for first in range(0, len(tokens), step):
+            last = min(first + self.chunk_size, len(tokens))
+            start, end = self._trim(text, offsets[first], offsets[last])
+            if end > start:
+                chunk = self._make_chunk(
+                    text, start, end, len(chunks), page_number,
+                    paragraph_number, char_offset,
+                )
+                chunk["token_count"] = last - first
+                chunks.append(chunk)
+            if last == len(tokens):
+                break
         
         return chunks
     
-    def _get_overlap_text(self, text: str, overlap_size: int) -> str:
-        """Extract overlap text from end of text."""
-        if len(text) <= overlap_size:
-            return text
+    @staticmethod
+    def _trim(text: str, start: int, end: int) -> Tuple[int, int]:
+        """Narrow text[start:end] to exclude leading and trailing whitespace."""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
+    
+    @staticmethod
+    def _last_boundary(boundaries: Sequence[int], start: int, end: int) -> int:
+        """Return the position of the last boundary in [start, end), or -1."""
+        idx = bisect_left(boundaries, end)
+        if idx and boundaries[idx - 1] >= start:
+            return boundaries[idx - 1]
+        return -1
+    
+    @staticmethod
+    def _make_chunk(
+        text: str,
+        start: int,
+        end: int,
+        chunk_index: int,
+        page_number: Optional[int],
+        paragraph_number: Optional[int],
+        char_offset: int,
+    ) -> Dict:
+        """Materialize the chunk text[start:end] with its citation metadata."""
+        return {
+            "content": text[start:end],
+            "chunk_index": chunk_index,
+            "page_number": page_number,
+            "paragraph_number": paragraph_number,
+            "char_start": char_offset + start,
+            "char_end": char_offset + end,
+        }
+    
+    def _overlap_start(self, text: str, boundaries: Sequence[int], start: int, end: int) -> Optional[int]:
+        """
+        Find where the overlap carried over from text[start:end] begins.
+        
+        Returns:
+            Offset of the overlap, or None if there is nothing to carry over
+        """
+        if end - start <= self.chunk_overlap:
+            return start
         # Try to overlap at sentence boundary
-        overlap_text = text[-overlap_size:]
-        # Find last sentence boundary
-        last_period = overlap_text.rfind(".")
-        last_newline = overlap_text.rfind("\n")
-        split_pos = max(last_period, last_newline)
-        if split_pos > overlap_size // 2:  # Only if reasonable split found
-            return overlap_text[split_pos + 1:].strip()
-        return overlap_text.strip()
+        window_start = end - self.chunk_overlap
+        split_pos = self._last_boundary(boundaries, window_start, end)
+        if split_pos - window_start > self.chunk_overlap // 2:  # Only if reasonable split found
+            window_start = split_pos + 1
+        overlap_start, _ = self._trim(text, window_start, end)
+        return overlap_start if overlap_start < end else None
     
     def _split_large_text(
         self,
         text: str,
+        boundaries: Sequence[int],
+        start: int,
+        end: int,
         start_chunk_index: int,
         page_number: Optional[int],
         paragraph_number: Optional[int],
         char_offset: int,
     ) -> List[Dict]:
-        """Split large text into multiple chunks."""
+        """Split the large span text[start:end] into multiple chunks."""
+        if self._splitter is not None:
+            # chunk_indices yields trimmed chunks with their character offsets
+            return [
+                self._make_chunk(
+                    text, start + offset, start + offset + len(piece), start_chunk_index + i,
+                    page_number, paragraph_number, char_offset,
+                )
+                for i, (offset, piece) in enumerate(self._splitter.chunk_indices(text[start:end]))
+            ]
+        
         chunks = []
-        text_length = len(text)
-        current_pos = 0
-        chunk_index = start_chunk_index
+        current_pos = start
         
-        while current_pos < text_length:
-            chunk_end = min(current_pos + self.chunk_size, text_length)
+        while current_pos < end:
+            chunk_end = min(current_pos + self.chunk_size, end)
             
             # Try to split at sentence boundary
-            if chunk_end < text_length:
+            if chunk_end < end:
                 # Look for sentence boundary in last 20% of chunk
                 search_start = int(chunk_end - self.chunk_size * 0.2)
-                period_pos = text.rfind(".", search_start, chunk_end)
-                newline_pos = text.rfind("\n", search_start, chunk_end)
-                
-                split_pos = max(period_pos, newline_pos)
+                split_pos = self._last_boundary(boundaries, search_start, chunk_end)
                 if split_pos > search_start:
                     chunk_end = split_pos + 1
             
-            chunk_text = text[current_pos:chunk_end].strip()
-            if chunk_text:
-                chunks.append({
-                    "content": chunk_text,
-                    "chunk_index": chunk_index,
-                    "page_number": page_number,
-                    "paragraph_number": paragraph_number,
-                    "char_start": char_offset + current_pos,
-                    "char_end": char_offset + chunk_end,
-                })
-                chunk_index += 1
+            chunk_start, chunk_stop = self._trim(text, current_pos, chunk_end)
+            if chunk_stop > chunk_start:
+                chunks.append(self._make_chunk(
+                    text, chunk_start, chunk_stop, start_chunk_index + len(chunks),
+                    page_number, paragraph_number, char_offset,
+                ))
             
-            # Move to next chunk with overlap
-            current_pos = chunk_end - self.chunk_overlap if chunk_end < text_length else chunk_end
+            if chunk_end >= end:
+                break
+            # Move to next chunk with overlap, always making progress
+            current_pos = max(chunk_end - self.chunk_overlap, current_pos + 1)
         
         return chunks
 
 
 chunker = Chunker()
-
@@ -1,51 +1,147 @@
 """Document parser for extracting text from various file formats."""
 import fitz  # PyMuPDF
 from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
 import markdown
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import orjson
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Union
+from app.config import settings
 from app.services.storage import storage_service
 
+# Bump when the extraction output changes so stale cache entries are ignored
+PARSE_CACHE_VERSION = 1
+
+# Below this many pages, process start-up costs more than parallel extraction saves
+PARALLEL_MIN_PAGES = 64
+
+
+def _extract_page_range(file_content: bytes, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop) in a separate process."""
+    # PyMuPDF is not thread-safe, so each process opens its own document
+    with fitz.open(stream=file_content, filetype="pdf") as doc:
+        return [doc[page_num].get_text() for page_num in range(start, stop)]
+
 
 class DocumentParser:
     """Service for parsing documents and extracting text with metadata."""
     
+    def __init__(self):
+        # Created on the first write, so importing the parser has no side effects
+        self.cache_dir = Path(settings.PARSE_CACHE_DIR) if settings.PARSE_CACHE_DIR else None
+        self.cache_max_bytes = settings.PARSE_CACHE_MAX_MB * 1024 * 1024
+    
+    def _cache_path(self, file_content: Union[bytes, memoryview]) -> Optional[Path]:
+        """Return the cache file for this content, or None if caching is disabled."""
+        if not self.cache_dir:
+            return None
+        digest = hashlib.sha256(file_content).hexdigest()
+        return self.cache_dir / f"v{PARSE_CACHE_VERSION}-{digest}.json"
+    
+    def _write_cache(self, cache_path: Path, parsed: Dict) -> None:
+        """Store a parse result, then evict the least recently used entries over the size bound."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Write then rename so concurrent workers never read a partial file
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(orjson.dumps(parsed))
+        os.replace(tmp_path, cache_path)
+        
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # Evicted by another worker
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        if total <= self.cache_max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.cache_max_bytes:
+                break
+            if path == str(cache_path):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+    
     def parse_pdf(self, file_path: str) -> Dict:
         """
         Parse PDF and extract text with page-level metadata.
         
+        Extraction results are cached on disk keyed by the content hash, so
+        re-indexing the same PDF skips PyMuPDF entirely. The cache holds at
+        most PARSE_CACHE_MAX_MB; the least recently used entries go first.
+        The file is read through a memory map, so a cache hit never copies it
+        into memory.
+        
         Args:
             file_path: Path to PDF file
-            
+        
         Returns:
             Dictionary with 'text', 'pages', 'metadata'
         """
-        file_content = storage_service.get_file(file_path)
-        doc = fitz.open(stream=file_content, filetype="pdf")
+        with storage_service.open_file(file_path) as file_content:
+            cache_path = self._cache_path(file_content)
+            parsed = None
+            if cache_path:
+                try:
+                    parsed = orjson.loads(cache_path.read_bytes())
+                    # Hits refresh the mtime that eviction orders by
+                    os.utime(cache_path)
+                except FileNotFoundError:
+                    # Not cached yet, or just evicted by another worker
+                    pass
+            if parsed is None:
+                parsed = self._extract_pdf(file_content)
+                if cache_path:
+                    self._write_cache(cache_path, parsed)
+        
+        # The file name fallback is per upload, so it is not part of the cache
+        if not parsed["metadata"]["title"]:
+            parsed["metadata"]["title"] = Path(file_path).stem
+        return parsed
+    
+    def _extract_pdf(self, file_content: Union[bytes, memoryview]) -> Dict:
+        """Extract text, page offsets and metadata from PDF bytes or a buffer over them."""
+        # PyMuPDF does not pin a memory-mapped buffer, so the document must be
+        # closed (on every path) before the caller unmaps file_content
+        with fitz.open(stream=file_content, filetype="pdf") as doc:
+            page_texts = self._extract_page_texts(doc, file_content)
+            # Extract metadata
+            metadata = doc.metadata
+        title = metadata.get("title", "")
+        author = metadata.get("author", "")
         
         pages = []
         full_text = []
+        # Length of "\n".join(full_text) so far, tracked instead of re-joining
+        running_len = 0
         
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            text = page.get_text()
-            
+        for page_num, text in enumerate(page_texts):
             # Store page-level information
             page_data = {
                 "page_number": page_num + 1,
                 "text": text,
-                "char_start": len("\n".join(full_text)),
-                "char_end": len("\n".join(full_text)) + len(text),
+                "char_start": running_len,
+                "char_end": running_len + len(text),
             }
             pages.append(page_data)
             full_text.append(text)
-        
-        # Extract metadata
-        metadata = doc.metadata
-        title = metadata.get("title", "") or Path(file_path).stem
-        author = metadata.get("author", "")
-        
-        doc.close()
+            running_len += len(text) + 1
         
         return {
             "text": "\n".join(full_text),
@@ -57,31 +153,46 @@ class DocumentParser:
             },
         }
     
+    @staticmethod
+    def _extract_page_texts(doc: "fitz.Document", file_content: Union[bytes, memoryview]) -> List[str]:
+        """
+        Extract every page's text, splitting large PDFs across processes.
+        
+        Pages are partitioned into contiguous ranges, one per process, and
+        reassembled in order.
+        """
+        page_count = len(doc)
+        workers = min(settings.PDF_EXTRACT_PROCESSES, page_count // PARALLEL_MIN_PAGES)
+        # Daemonic processes (e.g. some worker pools) may not start children
+        if workers <= 1 or multiprocessing.current_process().daemon:
+            return [page.get_text() for page in doc]
+        
+        bounds = [page_count * i // workers for i in range(workers + 1)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Each process receives its own copy, so a mapped buffer is copied once here
+            parts = executor.map(_extract_page_range, repeat(bytes(file_content)), bounds[:-1], bounds[1:])
+            return [text for part in parts for text in part]
+    
     def parse_html(self, file_path: str) -> Dict:
         """
         Parse HTML and extract text with structure metadata.
         
         Args:
             file_path: Path to HTML file
-            
+        
         Returns:
             Dictionary with 'text', 'metadata'
         """
         file_content = storage_service.get_file(file_path)
-        soup = BeautifulSoup(file_content, "html.parser")
         
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
+        try:
+            text, title = self._extract_html(file_content)
+        except (etree.ParserError, ValueError):
+            # lxml rejects some inputs outright (e.g. empty documents)
+            text, title = self._extract_html_fallback(file_content)
         
-        # Get text
-        text = soup.get_text(separator="\n", strip=True)
-        
-        # Extract metadata
-        title = soup.title.string if soup.title else ""
         if not title:
-            title_tag = soup.find("h1")
-            title = title_tag.get_text() if title_tag else Path(file_path).stem
+            title = Path(file_path).stem
         
         return {
             "text": text,
@@ -93,18 +204,56 @@ class DocumentParser:
             },
         }
     
+    @staticmethod
+    def _extract_html(file_content: bytes) -> Tuple[str, Optional[str]]:
+        """Extract text and title from HTML with lxml's C parser."""
+        tree = lxml.html.fromstring(file_content)
+        
+        # Remove script and style elements
+        for element in tree.xpath("//script|//style"):
+            element.drop_tree()
+        
+        # Get text, one stripped string per line
+        text = "\n".join(s.strip() for s in tree.itertext() if s.strip())
+        
+        # Extract metadata
+        title = tree.findtext(".//title")
+        if not title:
+            title_tag = tree.find(".//h1")
+            title = title_tag.text_content() if title_tag is not None else None
+        return text, title
+    
+    @staticmethod
+    def _extract_html_fallback(file_content: bytes) -> Tuple[str, Optional[str]]:
+        """Extract text and title with BeautifulSoup's pure-Python parser."""
+        soup = BeautifulSoup(file_content, "html.parser")
+        
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.decompose()
+        
+        # Get text
+        text = soup.get_text(separator="\n", strip=True)
+        
+        # Extract metadata
+        title = soup.title.string if soup.title else None
+        if not title:
+            title_tag = soup.find("h1")
+            title = title_tag.get_text() if title_tag else None
+        return text, title
+    
     def parse_markdown(self, file_path: str) -> Dict:
         """
         Parse Markdown file.
         
         Args:
             file_path: Path to Markdown file
-            
+        
         Returns:
             Dictionary with 'text', 'metadata'
         """
-        file_content = storage_service.get_file(file_path)
-        text = file_content.decode("utf-8")
+        with storage_service.open_file(file_path) as file_content:
+            text = str(file_content, "utf-8")
         
         # Try to extract title from first heading
         lines = text.split("\n")
@@ -130,12 +279,12 @@ class DocumentParser:
         
         Args:
             file_path: Path to text file
-            
+        
         Returns:
             Dictionary with 'text', 'metadata'
         """
-        file_content = storage_service.get_file(file_path)
-        text = file_content.decode("utf-8")
+        with storage_service.open_file(file_path) as file_content:
+            text = str(file_content, "utf-8")
         
         return {
             "text": text,
@@ -154,7 +303,7 @@ class DocumentParser:
         Args:
             file_path: Path to document
             document_type: Type of document (pdf, html, markdown, text)
-            
+        
         Returns:
             Parsed document data
         """
@@ -1,22 +1,49 @@
 """Embedding service for generating text embeddings."""
+from functools import lru_cache
 from typing import List
+import asyncio
+import numpy as np
 from langchain_openai import OpenAIEmbeddings
-from app.config import settings
+from openai import AsyncOpenAI
+from app.config import RUNTIME
+
+
+def _normalize(vectors: List[List[float]]) -> np.ndarray:
+    """
+    Pack vectors into one array of unit length rows.
+    
+    Normalizing once here lets cosine similarity be computed as a plain dot
+    product downstream.
+    
+    Args:
+        vectors: Embedding vectors as returned by the API
+        
+    Returns:
+        Array of shape (len(vectors), dims) in RUNTIME.embed_dtype
+    """
+    arr = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(arr, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    arr /= norms
+    return arr.astype(RUNTIME.embed_dtype, copy=False)
 
 
 class EmbeddingService:
     """Service for generating text embeddings."""
     
     def __init__(self):
-        if settings.OPENAI_API_KEY:
+        if RUNTIME.openai_api_key:
             self.embeddings = OpenAIEmbeddings(
-                model=settings.OPENAI_EMBEDDING_MODEL,
-                openai_api_key=settings.OPENAI_API_KEY,
+                model=RUNTIME.embed_model,
+                openai_api_key=RUNTIME.openai_api_key,
             )
         else:
             self.embeddings = None
+        # Questions repeat heavily; embeddings are deterministic per model, so
+        # an LRU needs no expiry
+        self._cached_query = lru_cache(maxsize=RUNTIME.query_cache_size)(self._embed_query_frozen)
     
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
         """
         Generate embeddings for a list of documents.
         
@@ -24,14 +51,46 @@ class EmbeddingService:
             texts: List of text strings
             
         Returns:
-            List of embedding vectors
+            Array of L2-normalized embedding vectors, one row per text
+        """
+        return _normalize(asyncio.run(self.aembed_documents(texts)))
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings with batched, concurrent requests.
+        
+        Texts are sent in batches of RUNTIME.embed_batch_size, with at most
+        RUNTIME.embed_concurrency requests in flight. Each batch is retried
+        on its own, so one rate-limited batch does not fail the whole call.
+        
+        Args:
+            texts: List of text strings
+            
+        Returns:
+            List of embedding vectors, in input order
         """
         if not self.embeddings:
             raise ValueError("OpenAI API key not configured")
         
-        return self.embeddings.embed_documents(texts)
+        batch_size = RUNTIME.embed_batch_size
+        semaphore = asyncio.Semaphore(RUNTIME.embed_concurrency)
+        
+        # The client is bound to the running event loop, so it lives per call
+        # max_retries backs off exponentially (honouring Retry-After) on 429s,
+        # 5xx responses and connection errors
+        async with AsyncOpenAI(api_key=RUNTIME.openai_api_key, max_retries=RUNTIME.embed_max_retries) as client:
+            async def embed_batch(batch: List[str]) -> List[List[float]]:
+                async with semaphore:
+                    response = await client.embeddings.create(model=RUNTIME.embed_model, input=batch)
+                return [item.embedding for item in response.data]
+            
+            results = await asyncio.gather(*(
+                embed_batch(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)
+            ))
+        
+        return [vector for batch in results for vector in batch]
     
-    def embed_query(self, text: str) -> List[float]:
+    def embed_query(self, text: str) -> np.ndarray:
         """
         Generate embedding for a single query text.
         
@@ -39,12 +98,30 @@ class EmbeddingService:
             text: Query text string
             
         Returns:
-            Embedding vector
+            L2-normalized embedding vector
         """
         if not self.embeddings:
             raise ValueError("OpenAI API key not configured")
         
-        return self.embeddings.embed_query(text)
+        return _normalize(self.embeddings.embed_query(text))
+    
+    def embed_query_cached(self, text: str) -> np.ndarray:
+        """
+        Like embed_query, but answered from an in-process LRU for repeated texts.
+        
+        Args:
+            text: Query text string
+            
+        Returns:
+            Read-only L2-normalized embedding vector, shared between callers
+        """
+        return self._cached_query(text)
+    
+    def _embed_query_frozen(self, text: str) -> np.ndarray:
+        """Embed a query and mark the vector read-only so it can be cached."""
+        vector = self.embed_query(text)
+        vector.flags.writeable = False
+        return vector
 
 
 embedding_service = EmbeddingService()
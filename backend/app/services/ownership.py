@@ -0,0 +1,68 @@
+"""Project ownership checks shared by API endpoints."""
+from typing import Any, Dict, Optional, Type
+from sqlalchemy import insert, select, literal, exists, bindparam
+from sqlalchemy.orm import Session
+from app.database import Base
+from app.models.project import Project
+
+# Built once at import; SQLAlchemy's compiled cache keys on this statement, so
+# each request only binds parameters instead of rebuilding and recompiling it
+_project_owned_stmt = select(Project).where(
+    Project.id == bindparam("project_id"),
+    Project.user_id == bindparam("user_id"),
+)
+
+
+def get_owned_project(db: Session, project_id: int, user_id: int) -> Optional[Project]:
+    """
+    Load a project only if it belongs to the user.
+
+    Args:
+        db: Database session
+        project_id: Project to load
+        user_id: User that must own the project
+
+    Returns:
+        The project, or None if it does not exist or is not owned by the user
+    """
+    return db.execute(
+        _project_owned_stmt,
+        {"project_id": project_id, "user_id": user_id},
+    ).scalar_one_or_none()
+
+
+def insert_if_project_owned(
+    db: Session,
+    model: Type[Base],
+    values: Dict[str, Any],
+    project_id: int,
+    user_id: int,
+) -> Optional[Base]:
+    """
+    Insert a row only if the project belongs to the user.
+
+    Issues a single INSERT ... SELECT ... WHERE EXISTS (...) RETURNING
+    statement, so the ownership check and the write share one round-trip.
+    The returned object is loaded from RETURNING and detached from the
+    session, so the caller's commit does not expire it and reading it
+    afterwards needs no refresh SELECT.
+
+    Args:
+        db: Database session
+        model: ORM model to insert into
+        values: Column values for the new row
+        project_id: Project the row belongs to
+        user_id: User that must own the project
+
+    Returns:
+        The inserted (detached) ORM object, or None if the project is not
+        owned by the user
+    """
+    columns = model.__table__.c
+    owned = exists().where(Project.id == project_id, Project.user_id == user_id)
+    row = select(*(literal(value, columns[key].type) for key, value in values.items())).where(owned)
+    stmt = insert(model).from_select(list(values), row).returning(model)
+    obj = db.scalars(stmt).first()
+    if obj is not None:
+        db.expunge(obj)
+    return obj
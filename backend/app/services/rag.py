@@ -1,27 +1,39 @@
 """RAG service for question answering with citations."""
-from typing import List, Dict, Optional
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
-from langchain.schema import HumanMessage, SystemMessage
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Dict, Optional, Tuple
+from openai import OpenAI
 import json
-from app.config import settings
+import re
+from app.config import RUNTIME
 from app.services.vector_db import vector_db_service
 from app.services.embeddings import embedding_service
+from app.services.answer_cache import answer_cache
+
+# Inline citation markers such as [1], [2]
+_CITATION_RE = re.compile(r"\[(\d+)\]")
+
+# Constant system turn, built once; only the user turn varies per call
+_SYSTEM_MESSAGE = {"role": "system", "content": """You are a research assistant that answers questions using provided source documents. 
+Always cite your sources using [1], [2], etc. format when referencing information from the provided contexts.
+Be precise and factual. If information is not in the contexts, say so clearly."""}
+
+# Completions in flight at once in generate_answers_batch
+_BATCH_CONCURRENCY = 8
 
 
 class RAGService:
     """Service for RAG-based question answering with citation tracking."""
     
     def __init__(self):
-        if settings.OPENAI_API_KEY:
-            self.llm = ChatOpenAI(
-                model_name=settings.OPENAI_MODEL,
-                openai_api_key=settings.OPENAI_API_KEY,
-                temperature=0.0,
-                max_tokens=settings.MAX_TOKENS,
-            )
+        # Plain OpenAI client: chat completions take message dicts directly,
+        # without LangChain's per-call message validation and callbacks
+        if RUNTIME.openai_api_key:
+            self.client = OpenAI(api_key=RUNTIME.openai_api_key)
         else:
-            self.llm = None
+            self.client = None
+        self.top_k = RUNTIME.top_k
+        # Reported as model_used on every answer
+        self.model_name: Optional[str] = RUNTIME.llm_model if self.client else None
     
     def retrieve_context(self, question: str, top_k: int = None, project_id: Optional[int] = None) -> List[Dict]:
         """
@@ -31,21 +43,21 @@ class RAGService:
             question: User question
             top_k: Number of chunks to retrieve
             project_id: Optional project ID to filter documents
-            
+        
         Returns:
             List of context dictionaries with metadata
         """
-        top_k = top_k or settings.TOP_K_RETRIEVAL
+        top_k = top_k or self.top_k
         
         # Build filter if project_id provided
         filter_dict = None
         if project_id:
             filter_dict = {"project_id": project_id}
         
-        # Query vector database
-        # ChromaDB will use the embedding function to embed the query text automatically
+        # Query vector database with the (cached) question embedding
+        query_embedding = embedding_service.embed_query_cached(question)
         results = vector_db_service.query(
-            query_texts=[question],
+            query_embeddings=[query_embedding],
             n_results=top_k,
             filter_dict=filter_dict,
         )
@@ -72,79 +84,130 @@ class RAGService:
         self,
         question: str,
         contexts: List[Dict],
+        project_id: Optional[int] = None,
     ) -> Dict:
         """
         Generate answer with citations from retrieved contexts.
         
+        When the answer cache is enabled, a near-duplicate question asked in
+        the same project gets the cached result instead of a new completion,
+        as long as every chunk behind that result was retrieved again now.
+        
         Args:
             question: User question
             contexts: List of retrieved context dictionaries
-            
+            project_id: Project the question is asked in; enables the answer cache
+        
         Returns:
             Dictionary with 'answer', 'citations', 'sources'
         """
-        if not self.llm:
+        if not self.client:
             raise ValueError("LLM not configured")
         
+        query_embedding = None
+        if answer_cache.enabled and project_id is not None:
+            # Already cached by retrieve_context, so this is a dictionary lookup
+            query_embedding = embedding_service.embed_query_cached(question)
+            cached = answer_cache.get(project_id, query_embedding, [ctx["chunk_id"] for ctx in contexts])
+            if cached is not None:
+                return cached
+        
+        # Generate answer
+        messages, source_refs = self._build_messages(question, contexts)
+        
+        result = self._build_result(self._complete(messages), source_refs, contexts)
+        if query_embedding is not None:
+            answer_cache.put(project_id, query_embedding, result)
+        return result
+    
+    def generate_answer_stream(self, question: str, contexts: List[Dict]) -> Iterator[Dict]:
+        """
+        Generate an answer, yielding text as the model produces it.
+        
+        Args:
+            question: User question
+            contexts: List of retrieved context dictionaries
+        
+        Returns:
+            Iterator of {"delta": text} events, ending with one
+            {"result": ...} event holding what generate_answer returns
+        """
+        if not self.client:
+            raise ValueError("LLM not configured")
+        
+        messages, source_refs = self._build_messages(question, contexts)
+        parts = []
+        stream = self.client.chat.completions.create(
+            model=RUNTIME.llm_model,
+            messages=messages,
+            temperature=0.0,
+            max_tokens=RUNTIME.max_tokens,
+            stream=True,
+        )
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield {"delta": delta}
+        
+        # Citations are parsed once the full text is in
+        yield {"result": self._build_result("".join(parts), source_refs, contexts)}
+    
+    def generate_answers_batch(self, questions: List[Tuple[str, List[Dict]]]) -> List[Dict]:
+        """
+        Generate answers for several questions with concurrent completions.
+        
+        Args:
+            questions: (question, retrieved contexts) pairs
+        
+        Returns:
+            One result dictionary per question, as from generate_answer
+        """
+        if not self.client:
+            raise ValueError("LLM not configured")
+        
+        prepared = [self._build_messages(question, contexts) for question, contexts in questions]
+        # Completions are network-bound, so threads overlap them; the client is thread-safe
+        with ThreadPoolExecutor(max_workers=_BATCH_CONCURRENCY) as executor:
+            answers = list(executor.map(self._complete, [messages for messages, _ in prepared]))
+        return [
+            self._build_result(answer_text, source_refs, contexts)
+            for answer_text, (_, source_refs), (_, contexts) in zip(answers, prepared, questions)
+        ]
+    
+    def _complete(self, messages: List[Dict]) -> str:
+        """Run one chat completion and return its text."""
+        response = self.client.chat.completions.create(
+            model=RUNTIME.llm_model,
+            messages=messages,
+            temperature=0.0,
+            max_tokens=RUNTIME.max_tokens,
+        )
+        return response.choices[0].message.content or ""
+    
+    def _build_messages(self, question: str, contexts: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Build the chat messages for a question and its numbered sources.
+        
+        Returns:
+            Tuple of (messages, source references)
+        """
         # Build context string with source information
-        context_parts = []
-        source_refs = []
-        
-        for i, ctx in enumerate(contexts):
-            source_num = i + 1
-            metadata = ctx.get("metadata", {})
-            doc_name = metadata.get("document_filename", "Unknown")
-            page = metadata.get("page_number", "")
-            para = metadata.get("paragraph_number", "")
-            
-            # Build source reference
-            source_ref = f"[{source_num}]"
-            source_info = {
-                "source_num": source_num,
-                "chunk_id": ctx["chunk_id"],
-                "document_id": metadata.get("document_id"),
-                "document_filename": doc_name,
-                "page_number": page,
-                "paragraph_number": para,
-                "char_start": metadata.get("char_start"),
-                "char_end": metadata.get("char_end"),
-                "snippet": ctx["content"][:200] + "..." if len(ctx["content"]) > 200 else ctx["content"],
-            }
-            source_refs.append(source_info)
-            
-            # Build context text
-            context_text = f"{source_ref} {ctx['content']}"
-            context_parts.append(context_text)
-        
-        context_str = "\n\n".join(context_parts)
-        
-        # Build prompt
-        prompt_template = ChatPromptTemplate.from_messages([
-            SystemMessage(content="""You are a research assistant that answers questions using provided source documents. 
-Always cite your sources using [1], [2], etc. format when referencing information from the provided contexts.
-Be precise and factual. If information is not in the contexts, say so clearly.
-
-After your answer, provide a SOURCES section listing all citations used in the format:
-SOURCES:
-[1] Document: filename.pdf, Page: X, Paragraph: Y
-[2] Document: filename2.pdf, Page: A, Paragraph: B"""),
-            HumanMessage(content=f"""Contexts:
+        source_refs = [self._source_ref(i + 1, ctx) for i, ctx in enumerate(contexts)]
+        context_str = "\n\n".join(f"[{i + 1}] {ctx['content']}" for i, ctx in enumerate(contexts))
+        
+        messages = [_SYSTEM_MESSAGE, {"role": "user", "content": f"""Contexts:
 
 {context_str}
 
 Question: {question}
 
-Provide a comprehensive answer with citations. Include a SOURCES section at the end.""")
-        ])
-        
-        # Generate answer
-        messages = prompt_template.format_messages()
-        response = self.llm.invoke(messages)
-        answer_text = response.content
-        
-        # Parse answer and extract citations
+Provide a comprehensive answer with citations."""}]
+        return messages, source_refs
+    
+    def _build_result(self, answer_text: str, source_refs: List[Dict], contexts: List[Dict]) -> Dict:
+        """Parse a completion into the answer, its citations and the sources."""
         answer, citations = self._parse_answer_with_citations(answer_text, source_refs)
-        
         return {
             "answer": answer,
             "citations": citations,
@@ -152,59 +215,56 @@ Provide a comprehensive answer with citations. Include a SOURCES section at the
             "retrieved_chunks": [ctx["chunk_id"] for ctx in contexts],
         }
     
+    @staticmethod
+    def _source_ref(source_num: int, ctx: Dict) -> Dict:
+        """Build the source reference for one numbered context."""
+        metadata = ctx.get("metadata") or {}
+        content = ctx["content"]
+        return {
+            "source_num": source_num,
+            "chunk_id": ctx["chunk_id"],
+            "document_id": metadata.get("document_id"),
+            "document_filename": metadata.get("document_filename", "Unknown"),
+            # Unset fields are left out of the vector metadata, and Citation takes None
+            "page_number": metadata.get("page_number"),
+            "paragraph_number": metadata.get("paragraph_number"),
+            "char_start": metadata.get("char_start"),
+            "char_end": metadata.get("char_end"),
+            "snippet": content[:200] + ("..." if len(content) > 200 else ""),
+        }
+    
     def _parse_answer_with_citations(self, answer_text: str, source_refs: List[Dict]) -> tuple[str, List[Dict]]:
         """
         Parse answer text and extract citations.
         
+        Citations come only from the inline [n] markers; the source details
+        are taken from source_refs, so the model is not asked to repeat them.
+        
         Args:
             answer_text: Generated answer text
             source_refs: List of source reference dictionaries
-            
+        
         Returns:
             Tuple of (clean_answer, citations_list)
         """
-        # Split answer and sources section
-        if "SOURCES:" in answer_text or "Sources:" in answer_text:
-            parts = answer_text.split("SOURCES:", 1)
-            if len(parts) == 1:
-                parts = answer_text.split("Sources:", 1)
-            answer = parts[0].strip()
-            sources_text = parts[1].strip() if len(parts) > 1 else ""
-        else:
-            answer = answer_text
-            sources_text = ""
-        
-        # Extract citations from answer (find [1], [2], etc.)
-        citations = []
-        import re
-        citation_pattern = r'\[(\d+)\]'
-        matches = re.finditer(citation_pattern, answer)
+        answer = answer_text.strip()
         
-        for match in matches:
-            source_num = int(match.group(1))
-            # Find corresponding source
-            source = next((s for s in source_refs if s["source_num"] == source_num), None)
-            if source:
-                citations.append({
-                    "source_num": source_num,
-                    "chunk_id": source["chunk_id"],
-                    "document_id": source["document_id"],
-                    "document_filename": source["document_filename"],
-                    "page_number": source["page_number"],
-                    "paragraph_number": source["paragraph_number"],
-                    "char_start": source["char_start"],
-                    "char_end": source["char_end"],
-                    "snippet": source["snippet"],
-                })
-        
-        # Remove duplicate citations
+        # Extract citations from answer (find [1], [2], etc.), keeping the
+        # first mention of each chunk
+        # Sources are numbered 1..N in order, so [n] is source_refs[n - 1]
         seen = set()
         unique_citations = []
-        for cit in citations:
-            key = cit["chunk_id"]
-            if key not in seen:
-                seen.add(key)
-                unique_citations.append(cit)
+        
+        for match in _CITATION_RE.finditer(answer):
+            source_num = int(match.group(1))
+            if not 1 <= source_num <= len(source_refs):
+                continue
+            source = source_refs[source_num - 1]
+            if source["chunk_id"] not in seen:
+                seen.add(source["chunk_id"])
+                # A source reference already has exactly the citation fields;
+                # both are treated as read-only, so it is shared, not copied
+                unique_citations.append(source)
         
         return answer, unique_citations
 
@@ -1,26 +1,96 @@
 """Storage service for handling file uploads (local filesystem or S3)."""
+import asyncio
+import hashlib
+import io
+import mmap
 import os
+import tempfile
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import BinaryIO, Optional
+from typing import BinaryIO, Iterator, Optional, Tuple, Union
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from app.config import settings
 
+# Read size used when copying uploads to storage
+COPY_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+class FileTooLargeError(ValueError):
+    """Raised when a streamed file exceeds the allowed size."""
+
+
+class _SizeLimitedReader:
+    """File-like wrapper that counts bytes read and enforces a size limit."""
+    
+    def __init__(self, stream: BinaryIO, max_size: Optional[int] = None):
+        self._stream = stream
+        self.max_size = max_size
+        self.bytes_read = 0
+    
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._stream.read(size)
+        self.bytes_read += len(chunk)
+        if self.max_size is not None and self.bytes_read > self.max_size:
+            raise FileTooLargeError(f"File exceeds maximum size of {self.max_size} bytes")
+        return chunk
+
+
+def _disk_fileno(stream: BinaryIO) -> Optional[int]:
+    """Return the descriptor of a stream backed by a real file, or None."""
+    # Asking an in-memory SpooledTemporaryFile for its fileno would first
+    # spill it to disk, so small uploads keep the chunked copy. _rolled is
+    # private; if it ever goes away, keep the copy rather than force a spill
+    if isinstance(stream, tempfile.SpooledTemporaryFile) and not getattr(stream, "_rolled", False):
+        return None
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError, ValueError):
+        # io.UnsupportedOperation is an OSError and a ValueError
+        return None
+
 
 class StorageService:
     """Service for storing and retrieving files."""
     
     def __init__(self):
         self.storage_type = settings.STORAGE_TYPE
+        # Dedicated pool so blocking disk/S3 I/O never runs on the event loop
+        self.io_pool = ThreadPoolExecutor(
+            max_workers=settings.STORAGE_IO_WORKERS,
+            thread_name_prefix="storage-io",
+        )
         if self.storage_type == "s3":
+            # Sized for the I/O pool and multipart uploads sharing one client;
+            # adaptive retries back off client-side when S3 throttles
             self.s3_client = boto3.client(
                 "s3",
                 aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
                 aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
                 region_name=settings.AWS_REGION,
+                config=Config(
+                    max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                    retries={"mode": "adaptive", "max_attempts": 5},
+                    tcp_keepalive=True,
+                    connect_timeout=3,
+                    read_timeout=30,
+                ),
             )
+            self._presign = lru_cache(maxsize=1024)(self._presign_uncached)
             self.bucket_name = settings.AWS_S3_BUCKET
+            # Large files go up as concurrent multipart uploads, a part at a time
+            self.transfer_config = TransferConfig(
+                multipart_threshold=settings.S3_MULTIPART_CHUNK_MB * 1024 * 1024,
+                multipart_chunksize=settings.S3_MULTIPART_CHUNK_MB * 1024 * 1024,
+                max_concurrency=settings.S3_MAX_CONCURRENCY,
+                use_threads=True,
+            )
         else:
             # Local filesystem storage
             self.storage_path = Path(settings.STORAGE_PATH)
@@ -34,29 +104,127 @@ class StorageService:
             file_content: File content as bytes
             filename: Original filename
             folder: Folder/subdirectory name
-            
+        
         Returns:
             File path (local) or S3 key
         """
-        # Generate unique filename
+        # Bytes take the same chunked path as uploads; prefer save_stream for
+        # anything that is not already in memory
+        file_path, _ = self.save_stream(io.BytesIO(file_content), filename, folder)
+        return file_path
+    
+    def save_stream(
+        self,
+        file_stream: BinaryIO,
+        filename: str,
+        folder: str = "documents",
+        max_size: Optional[int] = None,
+    ) -> Tuple[str, int]:
+        """
+        Save a file-like object in fixed-size chunks without buffering it whole.
+        
+        Args:
+            file_stream: Readable binary stream
+            filename: Original filename
+            folder: Folder/subdirectory name
+            max_size: Optional size limit in bytes
+        
+        Returns:
+            Tuple of (file path (local) or S3 key, bytes written)
+        
+        Raises:
+            FileTooLargeError: If the stream exceeds max_size; nothing is kept
+        """
         file_ext = Path(filename).suffix
         unique_filename = f"{uuid.uuid4()}{file_ext}"
+        reader = _SizeLimitedReader(file_stream, max_size)
         
         if self.storage_type == "s3":
             s3_key = f"{folder}/{unique_filename}"
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=s3_key,
-                Body=file_content,
-            )
-            return s3_key
+            self.s3_client.upload_fileobj(reader, self.bucket_name, s3_key, Config=self.transfer_config)
+            return s3_key, reader.bytes_read
         else:
-            # Local storage
             folder_path = self.storage_path / folder
             folder_path.mkdir(parents=True, exist_ok=True)
             file_path = folder_path / unique_filename
-            file_path.write_bytes(file_content)
-            return str(file_path.relative_to(self.storage_path))
+            src_fd = _disk_fileno(file_stream) if hasattr(os, "sendfile") else None
+            try:
+                if src_fd is not None:
+                    size = self._sendfile(file_stream, src_fd, file_path, max_size)
+                else:
+                    with open(file_path, "wb") as out:
+                        while chunk := reader.read(COPY_CHUNK_SIZE):
+                            out.write(chunk)
+                    size = reader.bytes_read
+            except Exception:
+                file_path.unlink(missing_ok=True)
+                raise
+            return str(file_path.relative_to(self.storage_path)), size
+    
+    @staticmethod
+    def _sendfile(file_stream: BinaryIO, src_fd: int, file_path: Path, max_size: Optional[int]) -> int:
+        """
+        Copy the rest of a file-backed stream to file_path inside the kernel.
+        
+        Returns:
+            Bytes written
+        
+        Raises:
+            FileTooLargeError: If the remaining data exceeds max_size
+        """
+        offset = file_stream.tell()
+        size = max(os.fstat(src_fd).st_size - offset, 0)
+        if max_size is not None and size > max_size:
+            raise FileTooLargeError(f"File exceeds maximum size of {max_size} bytes")
+        dst_fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            written = 0
+            while written < size:
+                sent = os.sendfile(dst_fd, src_fd, offset + written, size - written)
+                if not sent:
+                    break
+                written += sent
+        finally:
+            os.close(dst_fd)
+        # sendfile leaves the stream position alone; match what reading would do
+        file_stream.seek(offset + written)
+        return written
+    
+    def digest_stream(self, file_stream: BinaryIO, max_size: Optional[int] = None) -> Tuple[str, int]:
+        """
+        Compute the SHA-256 of a seekable stream and rewind it.
+        
+        Args:
+            file_stream: Readable, seekable binary stream
+            max_size: Optional size limit in bytes
+        
+        Returns:
+            Tuple of (hex digest, size in bytes)
+        
+        Raises:
+            FileTooLargeError: If the stream exceeds max_size
+        """
+        hasher = hashlib.sha256()
+        reader = _SizeLimitedReader(file_stream, max_size)
+        while chunk := reader.read(COPY_CHUNK_SIZE):
+            hasher.update(chunk)
+        file_stream.seek(0)
+        return hasher.hexdigest(), reader.bytes_read
+    
+    async def run_io(self, func, *args, **kwargs):
+        """Run a blocking storage call on the storage I/O pool and await it."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_pool, partial(func, *args, **kwargs))
+    
+    async def save_stream_async(
+        self,
+        file_stream: BinaryIO,
+        filename: str,
+        folder: str = "documents",
+        max_size: Optional[int] = None,
+    ) -> Tuple[str, int]:
+        """Run save_stream on the storage I/O pool and await the result."""
+        return await self.run_io(self.save_stream, file_stream, filename, folder, max_size)
     
     def get_file(self, file_path: str) -> bytes:
         """
@@ -64,7 +232,7 @@ class StorageService:
         
         Args:
             file_path: File path (local) or S3 key
-            
+        
         Returns:
             File content as bytes
         """
@@ -75,13 +243,40 @@ class StorageService:
             full_path = self.storage_path / file_path
             return full_path.read_bytes()
     
+    @contextmanager
+    def open_file(self, file_path: str) -> Iterator[Union[bytes, memoryview]]:
+        """
+        Open file content as a read-only buffer for the duration of a with block.
+        
+        Local files are memory-mapped, so nothing is copied into Python memory
+        until a caller asks for it; S3 objects are downloaded as bytes.
+        
+        Args:
+            file_path: File path (local) or S3 key
+        
+        Yields:
+            memoryview over the mapped file (local) or bytes (S3); a memoryview
+            must not be used after the block exits
+        """
+        if self.storage_type == "s3":
+            yield self.get_file(file_path)
+            return
+        with open(self.storage_path / file_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # Empty files cannot be mapped
+                yield b""
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    yield view
+    
     def delete_file(self, file_path: str) -> bool:
         """
         Delete file.
         
         Args:
             file_path: File path (local) or S3 key
-            
+        
         Returns:
             True if successful, False otherwise
         """
@@ -103,23 +298,29 @@ class StorageService:
         Args:
             file_path: File path or S3 key
             expires_in: URL expiration in seconds (S3 only)
-            
+        
         Returns:
             URL string or None
         """
         if self.storage_type == "s3":
+            # URLs are reused within windows of half their lifetime, so a
+            # cached URL always has at least expires_in / 2 seconds left
+            window = int(time.time() // max(expires_in // 2, 1))
             try:
-                url = self.s3_client.generate_presigned_url(
-                    "get_object",
-                    Params={"Bucket": self.bucket_name, "Key": file_path},
-                    ExpiresIn=expires_in,
-                )
-                return url
+                return self._presign(file_path, expires_in, window)
             except ClientError:
                 return None
         else:
             # For local storage, return relative path (frontend will handle)
             return f"/api/v1/files/{file_path}"
+    
+    def _presign_uncached(self, file_path: str, expires_in: int, window: int) -> str:
+        """Generate a presigned GET URL; window only partitions the cache."""
+        return self.s3_client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket_name, "Key": file_path},
+            ExpiresIn=expires_in,
+        )
 
 
 storage_service = StorageService()
@@ -2,7 +2,8 @@
 import chromadb
 from chromadb.config import Settings
 from typing import List, Dict, Optional, Tuple
-from app.config import settings
+import numpy as np
+from app.config import RUNTIME, settings
 import uuid
 
 
@@ -16,21 +17,35 @@ class VectorDBService:
                 path=settings.CHROMA_PERSIST_DIR,
                 settings=Settings(anonymized_telemetry=False),
             )
-            self.collection_name = "research_documents"
+            # Dimensions differ per embedding model, so each model gets its own
+            # collection; switching models means reindexing documents
+            self.collection_name = f"research_documents__{RUNTIME.embed_model}"
             self._ensure_collection()
     
     def _ensure_collection(self):
         """Ensure collection exists."""
+        # Denser graph and wider searches than Chroma's defaults (M=16,
+        # construction_ef=100, search_ef=10), for better top-k recall
+        metadata = {
+            "hnsw:space": "cosine",
+            "hnsw:M": settings.CHROMA_HNSW_M,
+            "hnsw:construction_ef": settings.CHROMA_HNSW_CONSTRUCTION_EF,
+            "hnsw:search_ef": max(settings.CHROMA_HNSW_SEARCH_EF, settings.TOP_K_RETRIEVAL * 8),
+        }
+        # Embeddings always come from embedding_service and are passed in
+        # explicitly, so the collection gets no embedding function of its own
         try:
             self.collection = self.client.get_or_create_collection(
                 name=self.collection_name,
-                metadata={"hnsw:space": "cosine"},
+                metadata=metadata,
+                embedding_function=None,
             )
         except Exception as e:
             # Create new collection if get fails
             self.collection = self.client.create_collection(
                 name=self.collection_name,
-                metadata={"hnsw:space": "cosine"},
+                metadata=metadata,
+                embedding_function=None,
             )
     
     def add_documents(
@@ -38,6 +53,7 @@ class VectorDBService:
         documents: List[str],
         metadatas: List[Dict],
         ids: Optional[List[str]] = None,
+        embeddings: Optional[np.ndarray] = None,
     ) -> List[str]:
         """
         Add documents to vector database.
@@ -46,43 +62,55 @@ class VectorDBService:
             documents: List of document texts
             metadatas: List of metadata dictionaries
             ids: Optional list of IDs (generated if not provided)
-            
+            embeddings: Embeddings from embedding_service, one row per document;
+                required, since the collection has no embedding function
+        
         Returns:
             List of generated IDs
         """
+        if embeddings is None:
+            raise ValueError("Precomputed embeddings are required")
         if ids is None:
             ids = [str(uuid.uuid4()) for _ in documents]
         
         if self.db_type == "chroma":
-            self.collection.add(
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids,
-            )
+            # Written in fixed-size batches so large documents stay under
+            # Chroma's max batch size and are converted a slice at a time
+            batch_size = settings.VECTOR_DB_ADD_BATCH_SIZE
+            for start in range(0, len(documents), batch_size):
+                end = start + batch_size
+                self.collection.add(
+                    documents=documents[start:end],
+                    metadatas=metadatas[start:end],
+                    ids=ids[start:end],
+                    embeddings=self._as_lists(embeddings[start:end]),
+                )
         
         return ids
     
     def query(
         self,
-        query_texts: List[str],
+        query_texts: Optional[List[str]] = None,
         n_results: int = 5,
         filter_dict: Optional[Dict] = None,
+        query_embeddings: Optional[np.ndarray] = None,
     ) -> Dict:
         """
         Query vector database for similar documents.
         
         Args:
-            query_texts: List of query texts to search (will be embedded if embedding_fn is set)
+            query_texts: Unsupported without an embedding function; pass query_embeddings
             n_results: Number of results to return
             filter_dict: Optional filter dictionary (e.g., {"project_id": 1})
-            
+            query_embeddings: Precomputed query embeddings, used instead of query_texts
+        
         Returns:
             Dictionary with 'ids', 'documents', 'metadatas', 'distances'
         """
         if self.db_type == "chroma":
-            # ChromaDB will use embedding_fn to embed query_texts automatically
             results = self.collection.query(
-                query_texts=query_texts,
+                query_texts=query_texts if query_embeddings is None else None,
+                query_embeddings=self._as_lists(query_embeddings),
                 n_results=n_results,
                 where=filter_dict,
             )
@@ -94,6 +122,13 @@ class VectorDBService:
             }
         return {"ids": [], "documents": [], "metadatas": [], "distances": []}
     
+    @staticmethod
+    def _as_lists(embeddings: Optional[np.ndarray]) -> Optional[List[List[float]]]:
+        """Convert embedding rows to float lists, which every Chroma version accepts."""
+        if embeddings is None:
+            return None
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1).tolist()
+    
     def delete(self, ids: List[str]):
         """
         Delete documents by IDs.
@@ -112,10 +147,8 @@ class VectorDBService:
             filter_dict: Filter dictionary
         """
         if self.db_type == "chroma":
-            # Get IDs matching filter
-            results = self.collection.get(where=filter_dict)
-            if results["ids"]:
-                self.collection.delete(ids=results["ids"])
+            # Filtered server-side; matching records are never fetched
+            self.collection.delete(where=filter_dict)
     
     def get_collection_stats(self) -> Dict:
         """Get collection statistics."""
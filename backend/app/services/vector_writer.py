@@ -0,0 +1,116 @@
+"""Single-writer queue that coalesces vector DB writes within a process."""
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+import os
+import queue
+import threading
+import time
+import numpy as np
+from app.config import settings
+from app.services.vector_db import VectorDBService, vector_db_service
+
+# (documents, metadatas, ids, embeddings, future) for one submitted batch
+_Item = Tuple[List[str], List[Dict], List[str], np.ndarray, Future]
+
+
+class VectorWriter:
+    """
+    Funnel vector DB writes from many tasks through one writer thread.
+    
+    Writes submitted within VECTOR_WRITE_FLUSH_MS of each other are merged
+    into one add_documents call, so concurrent document tasks (e.g. an io
+    worker running with -P threads) stop contending for the collection's
+    write lock and persist in fewer, larger batches.
+    """
+    
+    def __init__(self, service: VectorDBService):
+        self._service = service
+        self.max_batch = settings.VECTOR_WRITE_MAX_BATCH
+        self.flush_interval = settings.VECTOR_WRITE_FLUSH_MS / 1000
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._queue: "queue.Queue[_Item]" = queue.Queue()
+    
+    def submit(
+        self,
+        documents: List[str],
+        metadatas: List[Dict],
+        ids: List[str],
+        embeddings: np.ndarray,
+    ) -> Future:
+        """
+        Queue documents with precomputed embeddings for writing.
+        
+        Args:
+            documents: List of document texts
+            metadatas: List of metadata dictionaries
+            ids: Vector DB IDs, one per document
+            embeddings: Embeddings, one row per document
+        
+        Returns:
+            Future that resolves once the documents are written
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((documents, metadatas, ids, embeddings, future))
+        return future
+    
+    def _ensure_started(self) -> None:
+        """Start the writer thread on first use in each (possibly forked) process."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A forked child inherits neither the thread nor a usable queue
+            self._queue = queue.Queue()
+            threading.Thread(target=self._run, name="vector-writer", daemon=True).start()
+            self._pid = os.getpid()
+    
+    def _run(self) -> None:
+        """Collect submitted batches until the flush window closes, then write them."""
+        while True:
+            items = [self._queue.get()]
+            count = len(items[0][0])
+            deadline = time.monotonic() + self.flush_interval
+            while count < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                items.append(item)
+                count += len(item[0])
+            self._write(items)
+    
+    def _write(self, items: List[_Item]) -> None:
+        """Write merged batches; if that fails, retry each alone so only the bad one fails."""
+        if len(items) > 1:
+            try:
+                self._add(items)
+            except Exception:
+                # Chroma skips ids it already holds, so a partial write is safe to redo
+                pass
+            else:
+                for item in items:
+                    item[4].set_result(None)
+                return
+        for item in items:
+            try:
+                self._add([item])
+            except Exception as e:
+                item[4].set_exception(e)
+            else:
+                item[4].set_result(None)
+    
+    def _add(self, items: List[_Item]) -> None:
+        """Write the given batches with one add_documents call."""
+        self._service.add_documents(
+            documents=[doc for item in items for doc in item[0]],
+            metadatas=[meta for item in items for meta in item[1]],
+            ids=[id_ for item in items for id_ in item[2]],
+            embeddings=np.concatenate([item[3] for item in items]),
+        )
+
+
+vector_writer = VectorWriter(vector_db_service)
@@ -2,10 +2,14 @@
 from celery import Celery
 from app.config import settings
 
+# Workers load only the task modules (models and services underneath them);
+# nothing here may import app.api or app.main, so the FastAPI app and its
+# routers are never built in worker processes
 celery_app = Celery(
     "researchranger",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
+    include=["app.workers.tasks"],
 )
 
 celery_app.conf.update(
@@ -17,5 +21,11 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=30 * 60,  # 30 minutes
     worker_prefetch_multiplier=1,
+    # Parsing is CPU-bound and embedding/indexing network-bound, so they get
+    # separate queues (and worker pools with different concurrency)
+    task_routes={
+        "parse_document": {"queue": "cpu"},
+        "index_chunks": {"queue": "io"},
+    },
 )
 
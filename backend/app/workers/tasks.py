@@ -1,4 +1,10 @@
 """Celery tasks for background processing."""
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+from app.config import RUNTIME
+from celery import chain
 from app.workers.celery_app import celery_app
 from app.database import SessionLocal
 from app.models.document import Document, DocumentStatus, DocumentChunk
@@ -6,6 +12,8 @@ from app.services.document_parser import document_parser
 from app.services.chunker import chunker
 from app.services.embeddings import embedding_service
 from app.services.vector_db import vector_db_service
+from app.services.vector_writer import vector_writer
+from sqlalchemy import func, insert
 from sqlalchemy.orm import Session
 
 
@@ -18,13 +26,156 @@ def get_db_session() -> Session:
         db.close()
 
 
+def _embed_chunks(chunks: List[Dict]) -> np.ndarray:
+    """Embed the content of a group of chunks."""
+    return embedding_service.embed_documents([chunk_data["content"] for chunk_data in chunks])
+
+
+def _vector_metadata(metadata: Dict) -> Dict:
+    """Drop unset fields; Chroma only accepts str, int, float and bool values."""
+    return {key: value for key, value in metadata.items() if value is not None}
+
+
+def _store_chunks(
+    db: Session,
+    document: Document,
+    chunks: List[Dict],
+    embeddings: np.ndarray,
+    embedding_model: Optional[str],
+) -> Future:
+    """
+    Write a group of embedded chunks to the database and queue them for the vector DB.
+    
+    Args:
+        db: Database session; rows are inserted but not committed
+        document: Document the chunks belong to
+        chunks: Chunk dictionaries from the chunker
+        embeddings: One embedding row per chunk
+        embedding_model: Model that produced the embeddings
+    
+    Returns:
+        Future that resolves once the vectors are written
+    """
+    # Vector DB ids are generated up front so chunks are written once
+    embedding_ids = [uuid.uuid4() for _ in chunks]
+    
+    # Store chunks in database with one multi-row INSERT ... RETURNING
+    chunk_ids = db.execute(
+        insert(DocumentChunk).returning(DocumentChunk.id, sort_by_parameter_order=True),
+        [
+            {
+                "document_id": document.id,
+                "content": chunk_data["content"],
+                "chunk_index": chunk_data["chunk_index"],
+                "page_number": chunk_data.get("page_number"),
+                "paragraph_number": chunk_data.get("paragraph_number"),
+                "char_start": chunk_data.get("char_start"),
+                "char_end": chunk_data.get("char_end"),
+                "token_count": chunk_data.get("token_count"),
+                "embedding_id": embedding_id,
+                "embedding_model": embedding_model,
+            }
+            for chunk_data, embedding_id in zip(chunks, embedding_ids)
+        ],
+    ).scalars().all()
+    
+    # Build metadata for vector DB; token_count stays in the database only
+    metadatas_for_vector_db = [
+        _vector_metadata({
+            "chunk_id": str(chunk_id),
+            "document_id": document.id,
+            "document_filename": document.original_filename,
+            "project_id": document.project_id,
+            "page_number": chunk_data.get("page_number"),
+            "paragraph_number": chunk_data.get("paragraph_number"),
+            "char_start": chunk_data.get("char_start"),
+            "char_end": chunk_data.get("char_end"),
+            "chunk_index": chunk_data["chunk_index"],
+        })
+        for chunk_id, chunk_data in zip(chunk_ids, chunks)
+    ]
+    
+    # Add to vector DB through the process-wide writer
+    return vector_writer.submit(
+        documents=[chunk_data["content"] for chunk_data in chunks],
+        metadatas=metadatas_for_vector_db,
+        ids=[str(embedding_id) for embedding_id in embedding_ids],
+        embeddings=embeddings,
+    )
+
+
+def enqueue_document(document_id: int):
+    """
+    Queue a document for processing as a two-stage chain.
+    
+    Parsing and chunking run on the "cpu" queue; embedding and indexing on
+    the "io" queue, so each stage can have its own worker pool and one
+    document's embedding overlaps another's parsing.
+    
+    Args:
+        document_id: ID of document to process
+    """
+    return chain(
+        parse_document_task.s(document_id),
+        index_chunks_task.s(document_id),
+    ).apply_async()
+
+
+@celery_app.task(name="reindex_documents")
+def reindex_documents_task(document_ids: Optional[List[int]] = None) -> int:
+    """
+    Queue documents for (re)processing.
+    
+    Run after an upgrade that leaves indexed vectors unreachable, e.g.
+    `celery -A app.workers.celery_app call reindex_documents`; migration
+    011_reindex has already reset those documents to UPLOADED.
+    
+    Args:
+        document_ids: Documents to queue; defaults to every UPLOADED document
+    
+    Returns:
+        Number of documents queued
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(Document.id)
+        if document_ids is None:
+            query = query.filter(Document.status == DocumentStatus.UPLOADED)
+        else:
+            query = query.filter(Document.id.in_(document_ids))
+        ids = [document_id for document_id, in query.order_by(Document.id)]
+    finally:
+        db.close()
+    
+    for document_id in ids:
+        enqueue_document(document_id)
+    return len(ids)
+
+
 @celery_app.task(name="process_document", bind=True, max_retries=3)
 def process_document_task(self, document_id: int):
     """
     Process a document: parse, chunk, embed, and index.
     
+    Kept under its original name so already-queued messages still run; it
+    only dispatches the staged chain.
+    
+    Args:
+        document_id: ID of document to process
+    """
+    enqueue_document(document_id)
+
+
+@celery_app.task(name="parse_document", bind=True, max_retries=3)
+def parse_document_task(self, document_id: int) -> List[Dict]:
+    """
+    Parse and chunk a document, storing its metadata.
+    
     Args:
         document_id: ID of document to process
+    
+    Returns:
+        Chunk dictionaries, numbered within the document
     """
     db = SessionLocal()
     try:
@@ -74,74 +225,110 @@ def process_document_task(self, document_id: int):
                 # Process entire document
                 all_chunks = chunker.chunk_text(text=full_text)
             
-            # Generate embeddings
-            chunk_texts = [chunk["content"] for chunk in all_chunks]
-            embeddings = embedding_service.embed_documents(chunk_texts)
+            # Chunker numbers chunks per call; renumber so chunk_index is unique
+            # and ordered within the document
+            for chunk_index, chunk_data in enumerate(all_chunks):
+                chunk_data["chunk_index"] = chunk_index
             
-            # Store chunks in database and vector DB
-            documents_for_vector_db = []
-            metadatas_for_vector_db = []
-            ids_for_vector_db = []
+            if not all_chunks:
+                raise ValueError("No text could be extracted from the document")
             
-            for i, chunk_data in enumerate(all_chunks):
-                # Create chunk in database
-                db_chunk = DocumentChunk(
-                    document_id=document.id,
-                    content=chunk_data["content"],
-                    chunk_index=chunk_data["chunk_index"],
-                    page_number=chunk_data.get("page_number"),
-                    paragraph_number=chunk_data.get("paragraph_number"),
-                    char_start=chunk_data.get("char_start"),
-                    char_end=chunk_data.get("char_end"),
-                )
-                db.add(db_chunk)
-                db.flush()  # Get chunk ID
-                
-                # Prepare for vector DB
-                chunk_id = f"chunk_{db_chunk.id}"
-                db_chunk.embedding_id = chunk_id
-                db_chunk.embedding_model = embedding_service.embeddings.model if embedding_service.embeddings else None
-                
-                # Build metadata for vector DB
-                metadata = {
-                    "chunk_id": str(db_chunk.id),
-                    "document_id": document.id,
-                    "document_filename": document.original_filename,
-                    "project_id": document.project_id,
-                    "page_number": chunk_data.get("page_number"),
-                    "paragraph_number": chunk_data.get("paragraph_number"),
-                    "char_start": chunk_data.get("char_start"),
-                    "char_end": chunk_data.get("char_end"),
-                    "chunk_index": chunk_data["chunk_index"],
-                }
-                
-                documents_for_vector_db.append(chunk_data["content"])
-                metadatas_for_vector_db.append(metadata)
-                ids_for_vector_db.append(chunk_id)
+            db.commit()
+            return all_chunks
+        
+        except Exception as e:
+            _fail_document(db, document, e)
+            raise
+    
+    except Exception as e:
+        # Retry task
+        raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
+    finally:
+        db.close()
+
+
+@celery_app.task(name="index_chunks", bind=True, max_retries=3)
+def index_chunks_task(self, all_chunks: List[Dict], document_id: int):
+    """
+    Embed a document's chunks and write them to the database and vector DB.
+    
+    Args:
+        all_chunks: Chunk dictionaries from parse_document_task
+        document_id: ID of document being processed
+    """
+    db = SessionLocal()
+    try:
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if not document:
+            raise ValueError(f"Document {document_id} not found")
+        
+        vector_writes = []
+        try:
+            # Drop vectors left by an earlier attempt that could not clean up
+            # after itself; its database rows were rolled back
+            vector_db_service.delete_by_metadata({"document_id": document.id})
+            # Reindexing replaces the chunk rows of an earlier successful run
+            db.query(DocumentChunk).filter(DocumentChunk.document_id == document.id).delete(synchronize_session=False)
             
-            # Add to vector DB
-            vector_db_service.add_documents(
-                documents=documents_for_vector_db,
-                metadatas=metadatas_for_vector_db,
-                ids=ids_for_vector_db,
-            )
+            # Embed the chunks in groups, prefetching the next group's
+            # embeddings while the current group is written to the database
+            # and the vector DB. Each group still fans out into concurrent
+            # embeddings requests.
+            embedding_model = embedding_service.embeddings.model if embedding_service.embeddings else None
+            group_size = RUNTIME.embed_batch_size * RUNTIME.embed_concurrency
+            groups = [all_chunks[i:i + group_size] for i in range(0, len(all_chunks), group_size)]
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed-prefetch") as executor:
+                pending = executor.submit(_embed_chunks, groups[0])
+                for group_index, group in enumerate(groups):
+                    embeddings = pending.result()
+                    if group_index + 1 < len(groups):
+                        pending = executor.submit(_embed_chunks, groups[group_index + 1])
+                    vector_writes.append(_store_chunks(db, document, group, embeddings, embedding_model))
+            
+            # Only report the document indexed once its vectors are written
+            for vector_write in vector_writes:
+                vector_write.result()
             
             # Update document status
             document.status = DocumentStatus.INDEXED
-            from datetime import datetime
-            document.indexed_at = datetime.utcnow()
+            document.indexed_at = func.now()
             db.commit()
-            
+        
         except Exception as e:
-            # Update status to failed
-            document.status = DocumentStatus.FAILED
-            document.processing_error = str(e)
-            db.commit()
+            _discard_vectors(document, vector_writes)
+            _fail_document(db, document, e)
             raise
-        
+    
     except Exception as e:
         # Retry task
         raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
     finally:
         db.close()
 
+
+def _discard_vectors(document: Document, vector_writes: List[Future]) -> None:
+    """
+    Remove the vectors a failed indexing attempt already sent to the vector DB.
+    
+    Their chunk rows are about to be rolled back, so once retries run out they
+    would otherwise stay retrievable with chunk ids that no longer exist.
+    """
+    # Wait for queued writes first, so none of them lands after the delete
+    for vector_write in vector_writes:
+        try:
+            vector_write.result()
+        except Exception:
+            pass
+    try:
+        vector_db_service.delete_by_metadata({"document_id": document.id})
+    except Exception:
+        # The next attempt starts with the same delete
+        pass
+
+
+def _fail_document(db: Session, document: Document, error: Exception) -> None:
+    """Discard the stage's uncommitted writes and mark the document failed."""
+    db.rollback()
+    document.status = DocumentStatus.FAILED
+    document.processing_error = str(error)
+    db.commit()
@@ -0,0 +1,46 @@
+"""Shared fixtures: an in-memory database behind the API's dependencies."""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.user import User
+from app.services.auth import get_current_active_user
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    # Configured like SessionLocal, so commits expire loaded objects
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def user(db_session):
+    user = User(email="owner@example.com", username="owner", hashed_password="x", is_active=True)
+    db_session.add(user)
+    db_session.commit()
+    # Stands in for the user the auth dependency loads; kept loaded and detached
+    db_session.refresh(user)
+    db_session.expunge(user)
+    return user
+
+
+@pytest.fixture
+def client(db_session, user):
+    """API client acting as ``user``, with every request on ``db_session``."""
+    app.dependency_overrides[get_db] = lambda: db_session
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,76 @@
+"""Tests for the semantic answer cache."""
+from unittest import mock
+
+import numpy as np
+
+from app.services.answer_cache import AnswerCache
+
+
+def _unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _cache(ttl=60.0, max_entries=10):
+    cache = AnswerCache()
+    cache.threshold = 0.9
+    cache.ttl = ttl
+    cache.max_entries = max_entries
+    return cache
+
+
+def test_expired_best_match_does_not_hide_live_entry():
+    cache = _cache(ttl=10.0)
+    with mock.patch("app.services.answer_cache.time.monotonic", return_value=0.0):
+        cache.put(1, _unit(1, 0), {"answer": "old"})
+    with mock.patch("app.services.answer_cache.time.monotonic", return_value=5.0):
+        cache.put(1, _unit(0.95, 0.31), {"answer": "live"})
+    
+    # The first entry is the closer match but has expired by now
+    with mock.patch("app.services.answer_cache.time.monotonic", return_value=12.0):
+        assert cache.get(1, _unit(1, 0)) == {"answer": "live"}
+        assert len(cache._projects[1][1]) == 1
+
+
+def test_get_prunes_fully_expired_project():
+    cache = _cache(ttl=10.0)
+    with mock.patch("app.services.answer_cache.time.monotonic", return_value=0.0):
+        cache.put(1, _unit(1, 0), {"answer": "old"})
+    with mock.patch("app.services.answer_cache.time.monotonic", return_value=20.0):
+        assert cache.get(1, _unit(1, 0)) is None
+    assert 1 not in cache._projects
+
+
+def test_put_evicts_oldest_beyond_max_entries():
+    cache = _cache(max_entries=2)
+    for i in range(3):
+        cache.put(1, _unit(1, i), {"answer": i})
+    vectors, results = cache._projects[1]
+    assert [result["answer"] for _, result in results] == [1, 2]
+    assert vectors.shape == (2, 2)
+
+
+def test_hit_requires_cached_chunks_to_be_retrieved_again():
+    cache = _cache()
+    cache.put(1, _unit(1, 0), {"answer": "a", "retrieved_chunks": ["c1", "c2"]})
+    
+    assert cache.get(1, _unit(1, 0), ["c2", "c1", "c3"])["answer"] == "a"
+    # A chunk behind the cached answer is gone (deleted, reindexed or not retrieved)
+    assert cache.get(1, _unit(1, 0), ["c1", "c3"]) is None
+
+
+def test_hit_falls_back_to_next_most_similar_valid_entry():
+    cache = _cache()
+    cache.put(1, _unit(0.95, 0.31), {"answer": "valid", "retrieved_chunks": ["c1"]})
+    cache.put(1, _unit(1, 0), {"answer": "stale", "retrieved_chunks": ["gone"]})
+    
+    assert cache.get(1, _unit(1, 0), ["c1"])["answer"] == "valid"
+
+
+def test_invalidate_drops_project_entries():
+    cache = _cache()
+    cache.put(1, _unit(1, 0), {"answer": "a", "retrieved_chunks": []})
+    cache.put(2, _unit(1, 0), {"answer": "b", "retrieved_chunks": []})
+    cache.invalidate(1)
+    assert cache.get(1, _unit(1, 0)) is None
+    assert cache.get(2, _unit(1, 0))["answer"] == "b"
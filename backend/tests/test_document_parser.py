@@ -0,0 +1,33 @@
+"""Tests for the parsed PDF cache."""
+import os
+
+from app.services.document_parser import DocumentParser
+
+
+def _parser(cache_dir, max_bytes):
+    parser = DocumentParser()
+    parser.cache_dir = cache_dir
+    parser.cache_max_bytes = max_bytes
+    return parser
+
+
+def test_cache_dir_is_created_on_first_write(tmp_path):
+    cache_dir = tmp_path / "parse_cache"
+    parser = _parser(cache_dir, 1024 * 1024)
+    assert not cache_dir.exists()
+    
+    parser._write_cache(cache_dir / "v1-a.json", {"text": "a"})
+    
+    assert (cache_dir / "v1-a.json").exists()
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    for mtime, name in [(1, "old"), (3, "used"), (2, "new")]:
+        (tmp_path / f"v1-{name}.json").write_bytes(b"x" * 30)
+        os.utime(tmp_path / f"v1-{name}.json", (mtime, mtime))
+    parser = _parser(tmp_path, 70)
+    
+    parser._write_cache(tmp_path / "v1-latest.json", {"text": "x" * 20})
+    
+    # Three 30-byte entries plus the new one exceed 70 bytes until the two oldest go
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["v1-latest.json", "v1-used.json"]
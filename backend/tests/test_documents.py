@@ -0,0 +1,27 @@
+"""Tests for the document endpoints."""
+from unittest import mock
+
+from app.api.v1.endpoints import documents
+from app.models.project import Project
+from app.models.user import User
+
+
+def test_upload_to_unowned_project_is_rejected_before_storing(client, db_session):
+    other = User(email="other@example.com", username="other", hashed_password="x", is_active=True)
+    db_session.add(other)
+    db_session.flush()
+    project = Project(name="theirs", user_id=other.id)
+    db_session.add(project)
+    db_session.commit()
+    project_id = project.id
+    
+    with mock.patch.object(documents, "storage_service") as storage:
+        response = client.post(
+            "/api/v1/documents",
+            data={"project_id": project_id},
+            files={"file": ("paper.txt", b"some text", "text/plain")},
+        )
+    
+    assert response.status_code == 404
+    storage.run_io.assert_not_called()
+    storage.save_stream_async.assert_not_called()
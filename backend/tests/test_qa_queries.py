@@ -0,0 +1,43 @@
+"""N+1 guards for the QA endpoints."""
+from app.database import assert_max_queries
+from app.models.project import Project
+from app.models.qa_session import QAResponse, QASession
+
+
+def test_get_session_responses_query_count_is_constant(client, user, db_session):
+    project = Project(name="p", user_id=user.id)
+    db_session.add(project)
+    db_session.flush()
+    session = QASession(project_id=project.id, user_id=user.id, title="t")
+    db_session.add(session)
+    db_session.flush()
+    db_session.add_all([
+        QAResponse(session_id=session.id, question=f"q{i}", answer=f"a{i}", citations=[], retrieved_chunk_ids=[])
+        for i in range(5)
+    ])
+    db_session.commit()
+    session_id = session.id
+    # Nothing is served from the identity map; the endpoint loads it all
+    db_session.expunge_all()
+    
+    # One query for the session and one SELECT ... IN for all its responses
+    with assert_max_queries(2):
+        response = client.get(f"/api/v1/qa/sessions/{session_id}/responses")
+    
+    assert response.status_code == 200
+    assert [item["question"] for item in response.json()] == [f"q{i}" for i in range(5)]
+
+
+def test_create_session_reads_returned_row_without_refresh(client, user, db_session):
+    project = Project(name="p", user_id=user.id)
+    db_session.add(project)
+    db_session.commit()
+    project_id = project.id
+    
+    # The ownership-checked INSERT ... RETURNING is the only statement; the
+    # returned row is serialized after commit without a refresh SELECT
+    with assert_max_queries(1):
+        response = client.post("/api/v1/qa/sessions", json={"project_id": project_id, "title": "t"})
+    
+    assert response.status_code == 201
+    assert response.json()["project_id"] == project_id
@@ -0,0 +1,92 @@
+"""Tests for the document indexing tasks."""
+import re
+import threading
+from concurrent.futures import Future
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+from app.schemas.qa import Citation
+from app.services.chunker import Chunker
+from app.services.rag import RAGService
+from app.workers import tasks
+
+
+class _WordEncoding:
+    """Stand-in for a tiktoken encoding: one token per word, keeping offsets."""
+    
+    def encode_ordinary(self, text):
+        self._spans = [m.span() for m in re.finditer(r"\S+\s*", text)]
+        self._text = text
+        return list(range(len(self._spans)))
+    
+    def decode_with_offsets(self, tokens):
+        return self._text, [self._spans[token][0] for token in tokens]
+
+
+def _store(chunks):
+    """Run _store_chunks on numbered chunks and return the vector metadata it queued."""
+    for chunk_index, chunk_data in enumerate(chunks):
+        chunk_data["chunk_index"] = chunk_index
+    document = SimpleNamespace(id=7, original_filename="paper.pdf", project_id=3)
+    db = mock.MagicMock()
+    db.execute.return_value.scalars.return_value.all.return_value = list(range(1, len(chunks) + 1))
+    with mock.patch.object(tasks, "vector_writer") as writer:
+        tasks._store_chunks(db, document, chunks, np.zeros((len(chunks), 4)), "test-model")
+    return writer.submit.call_args.kwargs["metadatas"]
+
+
+def _assert_chroma_compatible(metadatas):
+    for metadata in metadatas:
+        for key, value in metadata.items():
+            assert isinstance(value, (str, int, float, bool)), f"{key}={value!r}"
+
+
+def test_store_chunks_vector_metadata_in_chars_mode():
+    """Chars-mode chunks carry no token_count; Chroma must never see None values."""
+    chunker = Chunker(chunk_size=200, chunk_overlap=20)
+    assert chunker._encoding is None, "test expects the default CHUNK_UNIT=chars"
+    
+    text = "\n\n".join(f"Paragraph {i}. " + "Some sentence text. " * 8 for i in range(6))
+    chunks = chunker.chunk_text(text=text, page_number=1) + chunker.chunk_text(text=text)
+    metadatas = _store(chunks)
+    assert len(metadatas) == len(chunks)
+    assert all("token_count" not in metadata for metadata in metadatas)
+    _assert_chroma_compatible(metadatas)
+
+
+def test_token_mode_chunks_yield_valid_citations():
+    """Token-mode chunks have no paragraph number; citations must still validate."""
+    chunker = Chunker(chunk_size=16, chunk_overlap=4)
+    chunker._encoding = _WordEncoding()
+    
+    text = " ".join(f"word{i}" for i in range(60))
+    chunks = chunker.chunk_text(text=text, page_number=2)
+    assert len(chunks) > 1
+    assert all(chunk_data["paragraph_number"] is None for chunk_data in chunks)
+    
+    metadatas = _store(chunks)
+    _assert_chroma_compatible(metadatas)
+    
+    for source_num, (chunk_data, metadata) in enumerate(zip(chunks, metadatas), start=1):
+        ctx = {"chunk_id": "chunk", "content": chunk_data["content"], "metadata": metadata}
+        citation = Citation(**RAGService._source_ref(source_num, ctx))
+        assert citation.page_number == 2
+        assert citation.paragraph_number is None
+
+
+def test_discard_vectors_waits_for_writes_then_deletes():
+    """A failed attempt removes its vectors only once every queued write has settled."""
+    pending, failed = Future(), Future()
+    failed.set_exception(RuntimeError("write failed"))
+    # Still in the writer queue when cleanup starts
+    threading.Timer(0.05, pending.set_result, [None]).start()
+    
+    writes_settled_at_delete = []
+    with mock.patch.object(tasks, "vector_db_service") as vector_db:
+        vector_db.delete_by_metadata.side_effect = lambda where: writes_settled_at_delete.append(pending.done())
+        tasks._discard_vectors(SimpleNamespace(id=7), [pending, failed])
+    
+    vector_db.delete_by_metadata.assert_called_once_with({"document_id": 7})
+    assert writes_settled_at_delete == [True]